@@ -12,3 +12,7 @@ class ApiConfig(AppConfig):
     Class to represent configuration of an app
     """
     name = 'api'
+
+    def ready(self):
+        # Connect the signal receivers and register the system checks.
+        from . import checks, signals  # noqa: F401
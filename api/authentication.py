@@ -0,0 +1,211 @@
+"""
+This module contains the custom Authentication classes needed for this app.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import (BasicAuthentication,
+                                           TokenAuthentication)
+from rest_framework.authtoken.models import Token
+
+from . import membership, tokens
+
+# Prefix of the cache keys of the authenticated tokens.
+TOKEN_KEY_PREFIX = 'api:auth-token:'
+
+
+# Fields of the User which are not kept in the cache of
+# CachedTokenAuthentication, as they are credentials.
+UNCACHED_USER_FIELDS = ('password',)
+
+
+def _token_cache_key(key):
+    # Hash the token so that the cache never holds usable credentials.
+    return TOKEN_KEY_PREFIX + hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def _get_cached_user_values(user):
+    """
+    Returns the values of the fields of `user` kept in the cache of
+    CachedTokenAuthentication, by attribute name.
+    """
+    return dict((field.attname, getattr(user, field.attname))
+                for field in user._meta.concrete_fields
+                if field.attname not in UNCACHED_USER_FIELDS)
+
+
+def evict_token(key):
+    """
+    Removes the token `key` from the cache of CachedTokenAuthentication.
+    """
+    cache.delete(_token_cache_key(key))
+
+
+def evict_user_tokens(user_id):
+    """
+    Removes the tokens of the User with id `user_id` from the cache of
+    CachedTokenAuthentication.
+    """
+    keys = Token.objects.filter(user__id=user_id).values_list('key',
+                                                               flat=True)
+    cache.delete_many([_token_cache_key(key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication which keeps the Users of the Tokens it has checked
+    in the Django cache for `TOKEN_CACHE_TIMEOUT` seconds, under a hash of
+    the Token. Neither the Token nor the password hash of the User is
+    cached, the password is loaded from the database if it is accessed.
+
+    The signal receivers in `api.signals` evict a Token when it is deleted,
+    e.g. on logout, and all the Tokens of a User whenever the User is saved,
+    e.g. when the password changes or the User is deactivated.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = _token_cache_key(key)
+        values = cache.get(cache_key)
+        if values is None:
+            try:
+                token = Token.objects.select_related('user').get(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            user = token.user
+            cache.set(cache_key, _get_cached_user_values(user),
+                      settings.TOKEN_CACHE_TIMEOUT)
+        else:
+            user = get_user_model().from_db('default', list(values),
+                                            list(values.values()))
+            token = Token.from_db('default', ['key', 'user_id'],
+                                  [key, user.id])
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.'))
+        return (user, token)
+
+
+class VerifiedCredentialCache(object):
+    """
+    In-process LRU cache of verified credentials, mapping an HMAC of the
+    credentials to the id and the password hash of their User. Entries expire
+    after `BASIC_AUTH_CACHE_TIMEOUT` seconds and at most
+    `BASIC_AUTH_CACHE_SIZE` entries are kept.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns the `(user_id, password_hash)` tuple of `key`, or None if it
+        is not cached or has expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1:]
+
+    def set(self, key, user_id, password_hash):
+        """
+        Caches `key` for the User with id `user_id`, evicting the least
+        recently used entries if the cache is full.
+        """
+        expires = time.monotonic() + settings.BASIC_AUTH_CACHE_TIMEOUT
+        with self._lock:
+            self._entries[key] = (expires, user_id, password_hash)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.BASIC_AUTH_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        """
+        Removes `key` from the cache.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def discard_user(self, user_id):
+        """
+        Removes all the entries of the User with id `user_id`.
+        """
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry[1] == user_id:
+                    del self._entries[key]
+
+
+verified_credentials = VerifiedCredentialCache()
+
+
+class CachedBasicAuthentication(BasicAuthentication):
+    """
+    BasicAuthentication which remembers the credentials it has verified in
+    the process, so that the password is not hashed again on every request.
+
+    A remembered User is loaded by id and only accepted if it is still active
+    and its password hash has not changed since, so changing the password
+    invalidates the credentials in every process. The signal receivers in
+    `api.signals` also drop the entries of a User of this process whenever
+    the User is saved.
+    """
+
+    def authenticate_credentials(self, userid, password, request=None):
+        key = salted_hmac('api.authentication.CachedBasicAuthentication',
+                          '{}\0{}'.format(userid, password)).hexdigest()
+        entry = verified_credentials.get(key)
+        if entry is not None:
+            user_id, password_hash = entry
+            user = get_user_model().objects.filter(pk=user_id).first()
+            if user is not None and user.is_active and \
+                    constant_time_compare(user.password, password_hash):
+                return (user, None)
+            verified_credentials.discard(key)
+
+        user, auth = super(CachedBasicAuthentication,
+                           self).authenticate_credentials(userid, password,
+                                                          request)
+        verified_credentials.set(key, user.pk, user.password)
+        return (user, auth)
+
+
+class SignedAccessTokenAuthentication(TokenAuthentication):
+    """
+    Authenticates requests with the signed access tokens of `api.tokens`,
+    sent in the header `Authorization: Bearer <token>`, without any query.
+
+    The User is built from the token with only its id, `is_secretary` and
+    `is_active` loaded, the other fields are loaded from the database when
+    they are first accessed. The privileges carried by the token are put in
+    the membership context of the User, so that the permission checks in
+    `api.permissions` are answered from memory.
+    """
+    keyword = 'Bearer'
+
+    def authenticate_credentials(self, key):
+        try:
+            payload = tokens.read_access_token(key)
+        except tokens.InvalidToken as error:
+            raise exceptions.AuthenticationFailed(str(error))
+
+        user = get_user_model().from_db(
+            'default', ['id', 'is_secretary', 'is_active'],
+            [payload['uid'], payload['sec'], True])
+        membership.get_context(user).set_privileges(payload['clubs'])
+        return (user, None)
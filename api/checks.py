@@ -0,0 +1,37 @@
+"""
+This module contains the system checks of this app.
+"""
+
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# Cache backends whose data is not shared by the server processes.
+PROCESS_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches)
+def check_token_version_cache(app_configs, **kwargs):
+    """
+    Warns if the signed access tokens of `api.tokens` are accepted while the
+    default cache, which holds their versions, is not shared by the server
+    processes. A token revoked in one process would then stay valid in the
+    others until it expires.
+    """
+    authentication_classes = settings.REST_FRAMEWORK.get(
+        'DEFAULT_AUTHENTICATION_CLASSES', ())
+    backend = settings.CACHES['default']['BACKEND']
+    if 'api.authentication.SignedAccessTokenAuthentication' not in \
+            authentication_classes or backend not in PROCESS_CACHE_BACKENDS:
+        return []
+    return [Warning(
+        'Signed access tokens are enabled but the default cache is not '
+        'shared by the server processes.',
+        hint='Revoked access tokens stay valid in the other processes for '
+             'up to ACCESS_TOKEN_LIFETIME seconds. Use a shared cache '
+             'backend, e.g. Memcached or Redis.',
+        obj=backend,
+        id='api.W001',
+    )]
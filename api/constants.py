@@ -11,6 +11,10 @@ REQUEST_STATUS_ACCEPTED = "AC"
 REQUEST_STATUS_REJECTED = "RE"
 REQUEST_STATUS_CANCELLED = "CN"
 
+EMAIL_STATUS_QUEUED = "QU"
+EMAIL_STATUS_SENT = "SN"
+EMAIL_STATUS_FAILED = "FL"
+
 # Dictionaries
 DISPLAY_NAME = {
     PRIVILEGE_REP: "Representative",
@@ -19,4 +23,7 @@ DISPLAY_NAME = {
     REQUEST_STATUS_ACCEPTED: "Accepted",
     REQUEST_STATUS_REJECTED: "Rejected",
     REQUEST_STATUS_CANCELLED: "Cancelled",
+    EMAIL_STATUS_QUEUED: "Queued",
+    EMAIL_STATUS_SENT: "Sent",
+    EMAIL_STATUS_FAILED: "Failed",
 }
@@ -9,7 +9,7 @@ from rest_framework import filters as rest_framework_filters
 from rest_framework.exceptions import ParseError
 from django.db.models import Q
 
-from . import models, constants
+from . import constants, scopes, search, timeline
 
 
 class ClubFilter(rest_framework_filters.BaseFilterBackend):
@@ -21,7 +21,7 @@ class ClubFilter(rest_framework_filters.BaseFilterBackend):
         only_my_clubs = bool(int(request.query_params.get('only_my', 0)))
         if only_my_clubs:
             queryset = queryset.filter(
-                roles__members__id__contains=request.user.id)
+                id__in=scopes.member_club_ids(request.user))
         return queryset
 
     def get_schema_fields(self, view):
@@ -75,13 +75,10 @@ class ClubMembershipRequestFilter(rest_framework_filters.BaseFilterBackend):
         except:
             raise ParseError
 
-        # Get the list of all clubs that user is a representative of
-        club_list = models.Club.objects.filter(
-            roles__privilege=constants.PRIVILEGE_REP,
-            roles__members__id__contains=request.user.id
-        )
+        # Only show requests for clubs that user is a representative of
         queryset = queryset.filter(
-            Q(club__in=club_list) | Q(user=request.user)
+            scopes.is_rep_of_club(request.user, 'club')
+            | Q(user=request.user)
         )
 
         if pending != -1:
@@ -128,7 +125,7 @@ class ClubRoleFilter(rest_framework_filters.BaseFilterBackend):
         except:
             raise ParseError
         queryset = queryset.filter(
-            club__roles__members__id__contains=request.user.id
+            club__id__in=scopes.member_club_ids(request.user)
         )
         if club_id != -1:
             queryset = queryset.filter(club__id=club_id)
@@ -196,12 +193,9 @@ class FeedbackFilter(rest_framework_filters.BaseFilterBackend):
             # Filter feedbacks of all clubs for which the user
             # is representative or the feedbacks which have
             # been posted by the user
-            club_list = models.Club.objects.filter(
-                roles__privilege=constants.PRIVILEGE_REP,
-                roles__members__id__contains=request.user.id
-            )
             queryset = queryset.filter(
-                Q(club__in=club_list) | Q(author=request.user))
+                scopes.is_rep_of_club(request.user, 'club')
+                | Q(author=request.user))
 
         if club_id != -1:
             queryset = queryset.filter(club__id=club_id)
@@ -249,13 +243,15 @@ class ProjectFilter(rest_framework_filters.BaseFilterBackend):
         if not request.user.is_secretary:
             # Filter projects of all clubs for which the user is a member
             queryset = queryset.filter(
-                clubs__roles__members__id__contains=request.user.id)
+                id__in=scopes.member_project_ids(request.user))
 
         if club_id != -1:
-            queryset = queryset.filter(clubs__id__contains=club_id)
+            queryset = queryset.filter(
+                id__in=scopes.club_project_ids(club_id))
 
         if only_my_projects:
-            queryset = queryset.filter(members__id__contains=request.user.id)
+            queryset = queryset.filter(
+                id__in=scopes.user_project_ids(request.user))
 
         return queryset
 
@@ -290,10 +286,11 @@ class ProjectMembershipFilter(rest_framework_filters.BaseFilterBackend):
         # Filter memberships of projects of all clubs for which the user
         # is a member
         queryset = queryset.filter(
-            project__clubs__roles__members__id__contains=request.user.id)
+            project__id__in=scopes.member_project_ids(request.user))
 
         if club_id != -1:
-            queryset = queryset.filter(project__clubs__id__contains=club_id)
+            queryset = queryset.filter(
+                project__id__in=scopes.club_project_ids(club_id))
 
         if project_id != -1:
             queryset = queryset.filter(project=project_id)
@@ -331,15 +328,24 @@ class PostFilter(rest_framework_filters.BaseFilterBackend):
         if channel_id != -1:
             # Filter all posts by the specified channel
             queryset = queryset.filter(channel__id=channel_id)
-        # Filter posts by the channel subscribed by the user
+        elif getattr(view, 'action', None) == 'list' and not \
+                search.get_terms(request.query_params.get('search', '')):
+            # Read the posts by the channel subscribed by the user in the
+            # order of the timeline of the user
+            queryset = timeline.HomeTimeline(request.user, queryset)
         else:
+            # Filter posts by the channel subscribed by the user, from the
+            # timeline of the user and the channels that are read on demand,
+            # to get one of them or to search them with a queryset
             queryset = queryset.filter(
-                channel__subscribers__id__contains=request.user.id)
+                Q(id__in=scopes.timeline_post_ids(request.user))
+                | Q(channel__id__in=scopes.fanout_on_read_channel_ids(
+                    request.user)))
 
         if order == -1:
-            queryset = queryset.order_by('-created')
+            queryset = queryset.order_by('-created', '-id')
         else:
-            queryset = queryset.order_by('created')
+            queryset = queryset.order_by('created', 'id')
 
         return queryset
 
@@ -386,7 +392,7 @@ class ConversationFilter(rest_framework_filters.BaseFilterBackend):
         # Filter conversations by the channel of clubs that the user is
         # a member of
         queryset = queryset.filter(
-            channel__club__roles__members__id__contains=request.user.id)
+            scopes.is_member_of_club(request.user, 'channel__club'))
 
         if parent_id != -1:
             queryset = queryset.filter(parent__id=parent_id)
@@ -440,7 +446,7 @@ class ChannelFilter(rest_framework_filters.BaseFilterBackend):
 
         if only_my_channels:
             queryset = queryset.filter(
-                subscribers__id__contains=request.user.id)
+                id__in=scopes.subscribed_channel_ids(request.user))
 
         return queryset
 
@@ -482,12 +488,9 @@ class FeedbackReplyFilter(rest_framework_filters.BaseFilterBackend):
             # Filter feedback replies of all clubs for which the user
             # is representative or the replies to feedbacks which have
             # been posted by the user
-            club_list = models.Club.objects.filter(
-                roles__privilege=constants.PRIVILEGE_REP,
-                roles__members__id__contains=request.user.id
-            )
             queryset = queryset.filter(
-                Q(parent__club__in=club_list) | Q(parent__author=request.user))
+                scopes.is_rep_of_club(request.user, 'parent__club')
+                | Q(parent__author=request.user))
 
         if club_id != -1:
             queryset = queryset.filter(parent__club__id=club_id)
@@ -501,3 +504,45 @@ class FeedbackReplyFilter(rest_framework_filters.BaseFilterBackend):
             queryset = queryset.order_by('created')
 
         return queryset
+
+
+class ContentSearchFilter(rest_framework_filters.BaseFilterBackend):
+    """
+    Filter that searches the `search_field` of the view with the full-text
+    search backend. It allows following parameters in request:
+        1. search: Only return objects matching all the terms in it. The
+        full-text backends match every term as the start of a word, e.g.
+        "foot" matches "football" but "ball" does not
+        2. ranked: Order the best matches first if set to a non-zero value,
+        otherwise keep the order imposed by the other filters
+    """
+
+    def get_schema_fields(self, view):
+        return [
+            coreapi.Field(name='search', location='query', required=False,
+                          description='Only return objects with words'
+                                      + ' starting with all the terms in this'
+                                      + ' search query.',
+                          type='string'),
+            coreapi.Field(name='ranked', location='query', required=False,
+                          description='Order the best matches of the search'
+                                      + ' first, if set to a non-zero value.',
+                          type='integer'),
+        ]
+
+    def filter_queryset(self, request, queryset, view):
+        try:
+            ranked = bool(int(request.query_params.get('ranked', 0)))
+        except:
+            raise ParseError
+
+        terms = search.get_terms(request.query_params.get('search', ''))
+        if not terms:
+            return queryset
+
+        queryset = search.get_backend().search(queryset, view.search_field,
+                                               terms, ranked)
+        if ranked:
+            queryset = queryset.order_by('-search_rank',
+                                         *queryset.query.order_by)
+        return queryset
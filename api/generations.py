@@ -0,0 +1,93 @@
+"""
+This module contains the per-Club generation counters used to invalidate
+cached data.
+
+Every Club has a generation number in the Django cache, which is bumped by
+the signal receivers in `api.signals` whenever data visible in that Club
+changes. Cached responses and fragments that depend on some Clubs include
+their generations in the cache key with `make_key()`, so that they are never
+read again once one of these Clubs has changed.
+
+A generation missing from the cache, e.g. evicted, is recreated from the
+current time, so that it can not repeat a generation that was used in keys
+before.
+"""
+
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+# Prefix of the cache keys of the generations.
+KEY_PREFIX = 'api:club-generation:'
+
+# Scope, used like the id of a Club, whose generation is bumped whenever any
+# Club is created, updated or deleted.
+CLUB_DIRECTORY = 'directory'
+
+
+def _key(club_id):
+    return '{}{}'.format(KEY_PREFIX, club_id)
+
+
+def _new_generation():
+    return int(time.time() * 1000000)
+
+
+def get_generations(club_ids):
+    """
+    Returns a dict mapping every id in `club_ids` to the current generation
+    of that Club.
+    """
+    keys = dict((_key(club_id), club_id) for club_id in club_ids)
+    found = cache.get_many(keys.keys())
+    generations = {}
+    for key, club_id in keys.items():
+        if key not in found:
+            # Another process may have created it meanwhile, keep theirs
+            cache.add(key, _new_generation(), timeout=None)
+            found[key] = cache.get(key)
+        generations[club_id] = found[key]
+    return generations
+
+
+def get_generation(club_id):
+    """
+    Returns the current generation of the Club with id `club_id`.
+    """
+    return get_generations([club_id])[club_id]
+
+
+def bump(club_ids):
+    """
+    Bumps the generations of the Clubs with ids in `club_ids` once the
+    current transaction is committed, so that data read before the commit is
+    not cached with the new generations.
+    """
+    club_ids = set(club_id for club_id in club_ids if club_id is not None)
+    if club_ids:
+        transaction.on_commit(lambda: _bump_now(club_ids))
+
+
+def _bump_now(club_ids):
+    for club_id in club_ids:
+        try:
+            cache.incr(_key(club_id))
+        except ValueError:
+            cache.set(_key(club_id), _new_generation(), timeout=None)
+
+
+def make_key(prefix, club_ids, *parts):
+    """
+    Returns a cache key made of `prefix` and a hash of the generations of the
+    Clubs with ids in `club_ids` and of `parts`.
+    """
+    generations = get_generations(set(club_ids))
+    digest = hashlib.sha1(':'.join(
+        ['{}.{}'.format(club_id, generation)
+         for club_id, generation in sorted(
+             generations.items(), key=lambda item: str(item[0]))] +
+        [str(part) for part in parts]
+    ).encode('utf-8')).hexdigest()
+    return '{}:{}'.format(prefix, digest)
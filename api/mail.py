@@ -0,0 +1,34 @@
+"""
+This module contains the email backend that queues emails in the outbox.
+
+The emails sent while handling a request, e.g. the confirmation emails of
+allauth and the password reset emails, are only saved as OutboxEmails, so
+that the request does not wait for the SMTP server. The `send_outbox`
+management command sends them with `OUTBOX_EMAIL_BACKEND`.
+"""
+
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import transaction
+
+from . import models
+
+
+class OutboxEmailBackend(BaseEmailBackend):
+    """
+    Email backend which saves the emails as OutboxEmails instead of sending
+    them.
+    """
+
+    def send_messages(self, email_messages):
+        emails = [models.OutboxEmail.from_message(message)
+                  for message in email_messages if message.recipients()]
+        if not emails:
+            return 0
+        try:
+            with transaction.atomic():
+                models.OutboxEmail.objects.bulk_create(emails)
+        except Exception:
+            if not self.fail_silently:
+                raise
+            return 0
+        return len(emails)
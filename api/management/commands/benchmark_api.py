@@ -0,0 +1,248 @@
+"""
+This module contains the `benchmark_api` management command.
+"""
+
+import json
+import math
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (CaptureQueriesContext, setup_test_environment,
+                               teardown_test_environment)
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api import constants
+from api.urls import router
+
+# Page sizes at which the number of queries of list routes must not change.
+SCALING_PAGE_SIZES = (1, 10, 50)
+# Page sizes for the list routes with an expanded field. A single row may
+# have nothing to expand, which saves the queries of the expansion.
+EXPAND_SCALING_PAGE_SIZES = (10, 50)
+
+
+def percentile(values, percent):
+    """
+    Returns the `percent` percentile of the non-empty list `values` using the
+    nearest-rank method.
+    """
+    ordered = sorted(values)
+    index = int(math.ceil(percent / 100.0 * len(ordered))) - 1
+    return ordered[max(index, 0)]
+
+
+class Command(BaseCommand):
+    """
+    Requests every GET route registered in `api.urls` as a secretary, a
+    representative, a plain member and an outsider, and records the latency
+    percentiles and the number of SQL queries of each of them in a JSON file.
+    If a baseline written by a previous run is given, fails when a route
+    needs more queries or has become slower than in the baseline. It can
+    also check that list routes run a constant number of queries whatever
+    the page size.
+    Run it against a database seeded with `seed_perf_data`.
+    """
+    help = 'Benchmarks the API endpoints as different kinds of users.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20,
+                            help='Number of measured requests per route.')
+        parser.add_argument('--warmup', type=int, default=2,
+                            help='Number of unmeasured requests per route.')
+        parser.add_argument('--route', action='append', dest='routes',
+                            default=[],
+                            help='Only benchmark the routes with this URL'
+                                 ' prefix, e.g. "posts". Can be repeated.')
+        parser.add_argument('--output', default='api_benchmark.json',
+                            help='Write the results to this JSON file.')
+        parser.add_argument('--baseline',
+                            help='Compare the results with this JSON file'
+                                 ' written by a previous run.')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed relative increase of the p90'
+                                 ' latency over the baseline.')
+        parser.add_argument('--check-query-scaling', action='store_true',
+                            help='Fail if the number of queries of a list'
+                                 ' route depends on the page size.')
+
+    def handle(self, *args, **options):
+        users = self.get_users()
+        results = {}
+        problems = []
+        setup_test_environment()
+        try:
+            for archetype, user in users.items():
+                client = APIClient()
+                for route, path in self.get_paths(client, user,
+                                                  options['routes']):
+                    key = '{} {}'.format(archetype, route)
+                    results[key] = self.measure(client, user, path,
+                                                options['warmup'],
+                                                options['iterations'])
+                    self.stdout.write('{:<45} {:>4} {:>8.1f}ms {:>4}q'.format(
+                        key, results[key]['status'], results[key]['p90_ms'],
+                        results[key]['queries']))
+                    if options['check_query_scaling'] and \
+                            route.endswith('-list'):
+                        problems.extend(self.check_query_scaling(
+                            client, user, key, path))
+        finally:
+            teardown_test_environment()
+
+        with open(options['output'], 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+        self.stdout.write('Wrote the results to {}.'.format(
+            options['output']))
+
+        if options['baseline']:
+            with open(options['baseline']) as baseline:
+                problems.extend(self.compare(results, json.load(baseline),
+                                             options['tolerance']))
+        for problem in problems:
+            self.stderr.write(problem)
+        if problems:
+            raise CommandError('{} problem(s) found.'.format(len(problems)))
+        self.stdout.write(self.style.SUCCESS('No problems found.'))
+
+    def get_users(self):
+        """
+        Returns a dict mapping every archetype to a User of that kind.
+        """
+        users = get_user_model().objects.filter(is_secretary=False)
+        reps = users.filter(
+            clubmembership__club_role__privilege=constants.PRIVILEGE_REP)
+        archetypes = {
+            'secretary': get_user_model().objects.filter(
+                is_secretary=True).first(),
+            'rep': reps.first(),
+            'member': users.filter(clubmembership__isnull=False).exclude(
+                id__in=reps.values('id')).first(),
+            'outsider': users.filter(clubmembership__isnull=True).first(),
+        }
+        for archetype, user in list(archetypes.items()):
+            if user is None:
+                self.stderr.write('Skipping {}s, there are none.'.format(
+                    archetype))
+                del archetypes[archetype]
+        if not archetypes:
+            raise CommandError('There are no users, seed the database first.')
+        return archetypes
+
+    def authenticate(self, client, user):
+        """
+        Authenticates the next requests of `client` as a fresh instance of
+        `user`, as loaded by the authentication of a real request, so that
+        nothing cached on the instance by a previous request, like its
+        membership context, is reused.
+        """
+        client.force_authenticate(get_user_model().objects.get(pk=user.pk))
+
+    def get_paths(self, client, user, prefixes):
+        """
+        Yields the name and path of every GET route registered in the router,
+        using the first object listed for `user` for detail routes.
+        """
+        for prefix, viewset, basename in router.registry:
+            if prefixes and prefix not in prefixes:
+                continue
+            list_path = reverse('{}-list'.format(basename))
+            yield '{}-list'.format(basename), list_path
+
+            self.authenticate(client, user)
+            response = client.get(list_path, {'limit': 1})
+            results = response.data.get('results') \
+                if response.status_code == 200 else None
+            if not results:
+                continue
+            pk = results[0]['id']
+            yield '{}-detail'.format(basename), reverse(
+                '{}-detail'.format(basename), kwargs={'pk': pk})
+            for extra_action in viewset.get_extra_actions():
+                if extra_action.detail and 'get' in extra_action.mapping:
+                    name = '{}-{}'.format(basename, extra_action.url_name)
+                    yield name, reverse(name, kwargs={'pk': pk})
+
+    def measure(self, client, user, path, warmup, iterations):
+        """
+        Requests `path` repeatedly as `user` and returns its latency
+        percentiles and number of queries.
+        """
+        timings = []
+        queries = 0
+        for i in range(warmup + iterations):
+            self.authenticate(client, user)
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = client.get(path)
+                elapsed = (time.perf_counter() - start) * 1000
+            if i >= warmup:
+                timings.append(elapsed)
+                queries = max(queries, len(captured))
+        return {
+            'path': path,
+            'status': response.status_code,
+            'queries': queries,
+            'mean_ms': sum(timings) / len(timings),
+            'p50_ms': percentile(timings, 50),
+            'p90_ms': percentile(timings, 90),
+            'p99_ms': percentile(timings, 99),
+        }
+
+    def get_expansions(self, basename):
+        """
+        Returns the names of the expandable fields of the list route of the
+        viewset registered as `basename`.
+        """
+        for _, viewset, registered_basename in router.registry:
+            if registered_basename == basename:
+                serializer_class = viewset(action='list') \
+                    .get_serializer_class()
+                return sorted(getattr(serializer_class.Meta, 'expandable',
+                                      {}))
+        return []
+
+    def check_query_scaling(self, client, user, key, path):
+        """
+        Returns a list of problems for the list route at `path` requested by
+        `user`, without and with each expandable field expanded, whose
+        number of queries depends on the page size.
+        """
+        problems = []
+        basename = key.split(' ')[-1][:-len('-list')]
+        for expand in [None] + self.get_expansions(basename):
+            counts = {}
+            for page_size in (EXPAND_SCALING_PAGE_SIZES if expand
+                              else SCALING_PAGE_SIZES):
+                params = {'limit': page_size}
+                if expand:
+                    params['expand'] = expand
+                self.authenticate(client, user)
+                with CaptureQueriesContext(connection) as captured:
+                    client.get(path, params)
+                counts[page_size] = len(captured)
+            if len(set(counts.values())) > 1:
+                problems.append('{}{}: {} queries for page sizes {}'.format(
+                    key, '?expand=' + expand if expand else '',
+                    list(counts.values()), list(counts.keys())))
+        return problems
+
+    def compare(self, results, baseline, tolerance):
+        """
+        Returns the list of regressions of `results` over `baseline`.
+        """
+        regressions = []
+        for key, result in sorted(results.items()):
+            previous = baseline.get(key)
+            if previous is None:
+                continue
+            if result['queries'] > previous['queries']:
+                regressions.append('{}: {} queries instead of {}'.format(
+                    key, result['queries'], previous['queries']))
+            if result['p90_ms'] > previous['p90_ms'] * (1 + tolerance):
+                regressions.append('{}: p90 of {:.1f}ms instead of {:.1f}ms'
+                                   .format(key, result['p90_ms'],
+                                           previous['p90_ms']))
+        return regressions
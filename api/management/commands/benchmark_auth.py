@@ -0,0 +1,102 @@
+"""
+This module contains the `benchmark_auth` management command.
+"""
+
+import base64
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (CaptureQueriesContext, setup_test_environment,
+                               teardown_test_environment)
+from django.urls import resolve
+from rest_framework.authentication import (BasicAuthentication,
+                                           TokenAuthentication)
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api import authentication
+from api.management.commands.seed_perf_data import PASSWORD, PREFIX
+
+# The authentication schemes to compare, as (name, authentication class,
+# kind of credentials) tuples.
+SCHEMES = (
+    ('token', TokenAuthentication, 'token'),
+    ('cached-token', authentication.CachedTokenAuthentication, 'token'),
+    ('basic', BasicAuthentication, 'basic'),
+    ('cached-basic', authentication.CachedBasicAuthentication, 'basic'),
+)
+
+
+class Command(BaseCommand):
+    """
+    Requests an API endpoint repeatedly with each authentication scheme in
+    turn and prints the number of requests per second and of SQL queries per
+    request with each of them.
+    Run it against a database seeded with `seed_perf_data`.
+    """
+    help = 'Compares the authentication classes on a hot endpoint.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/clubs',
+                            help='Path of the endpoint to request.')
+        parser.add_argument('--username',
+                            help='Authenticate as this user. Defaults to the'
+                                 ' first seeded user.')
+        parser.add_argument('--password', default=PASSWORD,
+                            help='Password of the user, for Basic'
+                                 ' authentication. Defaults to the password'
+                                 ' of the seeded users.')
+        parser.add_argument('--requests', type=int, default=500,
+                            help='Number of measured requests per scheme.')
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by('id')
+        if options['username']:
+            users = users.filter(username=options['username'])
+        else:
+            users = users.filter(username__startswith=PREFIX + '_user_')
+        user = users.first()
+        if user is None:
+            raise CommandError('There is no such user, seed the database'
+                               ' first.')
+        token, _ = Token.objects.get_or_create(user=user)
+        authorization = {
+            'token': 'Token {}'.format(token.key),
+            'basic': 'Basic {}'.format(base64.b64encode('{}:{}'.format(
+                user.username, options['password']).encode('utf-8'))
+                .decode('ascii')),
+        }
+        view_class = resolve(options['path']).func.cls
+        default_classes = view_class.authentication_classes
+
+        setup_test_environment()
+        try:
+            for name, authentication_class, kind in SCHEMES:
+                view_class.authentication_classes = (authentication_class,)
+                client = APIClient()
+                client.credentials(HTTP_AUTHORIZATION=authorization[kind])
+                self.report(name, client, options['path'],
+                            options['requests'])
+        finally:
+            view_class.authentication_classes = default_classes
+            teardown_test_environment()
+
+    def report(self, name, client, path, requests):
+        """
+        Requests `path` with `client` and prints the throughput.
+        """
+        response = client.get(path)
+        if response.status_code != 200:
+            raise CommandError('{} got status {} for {}.'.format(
+                name, response.status_code, path))
+
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            for _ in range(requests):
+                client.get(path)
+            elapsed = time.perf_counter() - start
+        self.stdout.write('{:<15} {:>8.1f} requests/s {:>6.1f} queries'
+                          .format(name, requests / elapsed,
+                                  len(captured) / float(requests)))
@@ -0,0 +1,141 @@
+"""
+This module contains the `benchmark_renderers` management command.
+"""
+
+import gzip
+import io
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from rest_framework import parsers, renderers
+from rest_framework.test import APIClient
+
+from api import parsers as custom_parsers
+from api import renderers as custom_renderers
+from api.urls import router
+
+# The formats to compare, as (name, renderer class, parser class) tuples. The
+# first one is the baseline of the others.
+FORMATS = (
+    ('json', renderers.JSONRenderer, parsers.JSONParser),
+    ('fast-json', custom_renderers.FastJSONRenderer,
+     custom_parsers.FastJSONParser),
+    ('msgpack', custom_renderers.MessagePackRenderer,
+     custom_parsers.MessagePackParser),
+)
+
+
+def best_time(function, iterations, repeat):
+    """
+    Returns the shortest mean duration in microseconds of `iterations` calls
+    of `function` over `repeat` runs.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        timings.append((time.perf_counter() - start) * 1e6 / iterations)
+    return min(timings)
+
+
+class Command(BaseCommand):
+    """
+    Fetches a page of every list route registered in `api.urls` and times
+    rendering and parsing it with the standard JSON renderer and parser and
+    with the custom ones in `api.renderers` and `api.parsers`, along with the
+    size of the payload in each format. Fails if a format does not give back
+    the same data as the baseline.
+    Run it against a database seeded with `seed_perf_data`.
+    """
+    help = 'Compares the renderers and parsers on real API payloads.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username',
+                            help='Fetch the payloads as this user. Defaults'
+                                 ' to a secretary.')
+        parser.add_argument('--limit', type=int, default=50,
+                            help='Number of objects per payload.')
+        parser.add_argument('--iterations', type=int, default=200,
+                            help='Number of calls per measured run.')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Number of measured runs, the best is kept.')
+
+    def handle(self, *args, **options):
+        if custom_renderers.orjson is None:
+            self.stderr.write('orjson is not installed, the fast JSON'
+                              ' renderer falls back to the standard library.')
+        problems = []
+        self.stdout.write('{:<25} {:<10} {:>9} {:>9} {:>11} {:>11}'.format(
+            'route', 'format', 'bytes', 'gzipped', 'render', 'parse'))
+        for route, data in self.get_payloads(options):
+            baseline = None
+            for name, renderer_class, parser_class in FORMATS:
+                renderer = renderer_class()
+                parser = parser_class()
+                content = renderer.render(data, renderer.media_type)
+                render_us = best_time(
+                    lambda: renderer.render(data, renderer.media_type),
+                    options['iterations'], options['repeat'])
+                parse_us = best_time(
+                    lambda: parser.parse(io.BytesIO(content),
+                                         parser.media_type),
+                    options['iterations'], options['repeat'])
+                self.stdout.write(
+                    '{:<25} {:<10} {:>9} {:>9} {:>9.1f}us {:>9.1f}us'.format(
+                        route, name, len(content),
+                        len(gzip.compress(content)), render_us, parse_us))
+
+                parsed = self.normalize(
+                    parser.parse(io.BytesIO(content), parser.media_type))
+                if baseline is None:
+                    baseline = parsed
+                elif parsed != baseline:
+                    problems.append('{}: {} does not give back the same'
+                                    ' data as {}'.format(route, name,
+                                                         FORMATS[0][0]))
+
+        for problem in problems:
+            self.stderr.write(problem)
+        if problems:
+            raise CommandError('{} problem(s) found.'.format(len(problems)))
+        self.stdout.write(self.style.SUCCESS('No problems found.'))
+
+    def get_payloads(self, options):
+        """
+        Yields the name and the response data of every list route.
+        """
+        users = get_user_model().objects.all()
+        if options['username']:
+            user = users.filter(username=options['username']).first()
+        else:
+            user = users.filter(is_secretary=True).first()
+        if user is None:
+            raise CommandError('There is no such user, seed the database'
+                               ' first.')
+
+        client = APIClient()
+        client.force_authenticate(user)
+        setup_test_environment()
+        try:
+            for prefix, viewset, basename in router.registry:
+                response = client.get(reverse('{}-list'.format(basename)),
+                                      {'limit': options['limit']})
+                if response.status_code != 200:
+                    self.stderr.write('Skipping {}, got status {}.'.format(
+                        prefix, response.status_code))
+                    continue
+                yield prefix, response.data
+        finally:
+            teardown_test_environment()
+
+    def normalize(self, data):
+        """
+        Returns `data` as it is read back from the standard JSON format, so
+        that the data parsed from different formats can be compared.
+        """
+        return json.loads(renderers.JSONRenderer().render(data))
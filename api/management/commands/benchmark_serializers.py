@@ -0,0 +1,81 @@
+"""
+This module contains the `benchmark_serializers` management command.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from api import readers
+from api import viewsets as custom_viewsets
+from api.urls import router
+
+
+def best_time(function, repeat):
+    """
+    Calls `function` `repeat` times and returns the shortest duration in
+    milliseconds along with the result of the last call.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings), result
+
+
+class Command(BaseCommand):
+    """
+    Serializes the same rows of every list route which uses the values
+    readers of `api.readers`, once with the serializer and once with its
+    ValuesReader, and prints the time per 1,000 rows of both. Fails if the
+    JSON produced by the two differs.
+    Run it against a database seeded with `seed_perf_data`.
+    """
+    help = 'Compares the serializers with their values readers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000,
+                            help='Number of rows to serialize per route.')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Number of measured runs, the best is kept.')
+
+    def handle(self, *args, **options):
+        renderer = JSONRenderer()
+        problems = []
+        self.stdout.write('{:<36} {:>10} {:>10}'.format(
+            'route (per 1,000 rows)', 'serializer', 'reader'))
+        for prefix, viewset, _ in router.registry:
+            if not issubclass(viewset, custom_viewsets.ValuesListMixin):
+                continue
+            view = viewset(action='list', request=None, format_kwarg=None)
+            serializer_class = view.get_serializer_class()
+            reader = readers.get_reader(serializer_class)
+            queryset = view.get_queryset().order_by('pk')[:options['rows']]
+
+            serializer_ms, data = best_time(
+                lambda: serializer_class(queryset.all(), many=True).data,
+                options['repeat'])
+            reader_ms, rows = best_time(
+                lambda: reader.represent(reader.read(queryset)),
+                options['repeat'])
+            if not data:
+                self.stderr.write('Skipping {}, there are no rows.'.format(
+                    prefix))
+                continue
+
+            per_thousand = 1000.0 / len(data)
+            self.stdout.write(
+                '{:<25} {:>5} rows {:>8.1f}ms {:>8.1f}ms {:>5.1f}x'.format(
+                    prefix, len(data), serializer_ms * per_thousand,
+                    reader_ms * per_thousand, serializer_ms / reader_ms))
+            if renderer.render(data) != renderer.render(rows):
+                problems.append('{}: the values reader output differs from'
+                                ' the serializer'.format(prefix))
+
+        for problem in problems:
+            self.stderr.write(problem)
+        if problems:
+            raise CommandError('{} problem(s) found.'.format(len(problems)))
+        self.stdout.write(self.style.SUCCESS('No problems found.'))
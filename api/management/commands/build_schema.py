@@ -0,0 +1,44 @@
+"""
+This module contains the `build_schema` management command.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+
+from api import schema
+from api.urls import schema_view
+
+
+class Command(BaseCommand):
+    """
+    Generates the OpenAPI schema served by the schema views in `api.urls`
+    and writes it to a file, in YAML if its name ends with `.yaml` and in
+    JSON otherwise, e.g. to publish it along with a release. Also prints the
+    code version that the servers build the same schema for, and how long
+    generating it takes.
+    """
+    help = 'Writes the OpenAPI schema of the API to a file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output',
+                            help='Path of the file to write the schema to.')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        swagger = schema.build_schema(schema_view)
+        duration = time.perf_counter() - start
+
+        if options['output'].endswith('.yaml'):
+            codec = OpenAPICodecYaml(validators=[])
+        else:
+            codec = OpenAPICodecJson(validators=[])
+        with open(options['output'], 'wb') as output:
+            output.write(codec.encode(swagger))
+
+        self.stdout.write('Code version: {}'.format(
+            schema.get_code_version()))
+        self.stdout.write(self.style.SUCCESS(
+            'Generated the schema in {:.0f}ms and wrote it to {}.'.format(
+                duration * 1000, options['output'])))
@@ -0,0 +1,150 @@
+"""
+This module contains the `explain_filters` management command.
+"""
+
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api import filters, timeline
+from api.urls import router
+
+
+class Command(BaseCommand):
+    """
+    Runs EXPLAIN on the default query of every filter backend in
+    `api.filters` and fails if any of them falls back to a filesort or a full
+    table scan. It is meant to be run against a seeded database, the plans of
+    an almost empty database are not representative.
+    """
+    help = 'Checks the query plans of the filter backends in api.filters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--username', action='append', dest='usernames', default=[],
+            help='Explain the queries of this user. Can be repeated. Defaults'
+                 ' to the user with most memberships and a secretary.',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('mysql', 'sqlite'):
+            raise CommandError(
+                'Query plans of {} are not supported.'.format(
+                    connection.vendor))
+
+        problems = []
+        for user in self.get_users(options['usernames']):
+            problems.extend(self.find_problems(user))
+
+        for problem in problems:
+            self.stderr.write(problem)
+        if problems:
+            raise CommandError(
+                '{} problem(s) found in the query plans.'.format(
+                    len(problems)))
+        self.stdout.write(self.style.SUCCESS('All query plans use indexes.'))
+
+    def get_users(self, usernames):
+        """
+        Returns the users to explain the queries for.
+        """
+        user_model = get_user_model()
+        if usernames:
+            users = list(user_model.objects.filter(username__in=usernames))
+            if len(users) != len(set(usernames)):
+                raise CommandError('Some of the users do not exist.')
+            return users
+
+        users = []
+        member = user_model.objects.annotate(
+            num_memberships=Count('clubmembership'),
+        ).order_by('-num_memberships').first()
+        if member is None:
+            raise CommandError('There are no users, seed the database first.')
+        users.append(member)
+        secretary = user_model.objects.filter(is_secretary=True).first()
+        if secretary is not None and secretary != member:
+            users.append(secretary)
+        return users
+
+    def find_problems(self, user):
+        """
+        Returns the list of problems found in the query plans of the default
+        queries of every filter backend in `api.filters` for `user`.
+        """
+        if connection.vendor == 'mysql':
+            find_problems = self.find_mysql_problems
+        else:
+            find_problems = self.find_sqlite_problems
+        problems = []
+        for prefix, viewset, _ in router.registry:
+            for backend in viewset.filter_backends:
+                if backend.__module__ != filters.__name__:
+                    continue
+                for queryset in self.get_default_querysets(
+                        prefix, viewset, backend, user):
+                    for problem in find_problems(queryset):
+                        problems.append('{} ({} as {}): {}'.format(
+                            prefix, backend.__name__, user.username,
+                            problem))
+        return problems
+
+    def get_default_querysets(self, prefix, viewset, backend, user):
+        """
+        Returns the queries of the first page of the list query of `viewset`
+        as filtered by `backend` for a request by `user` without any query
+        parameters. The home timeline is read with one query per source.
+        """
+        request = Request(APIRequestFactory().get('/api/' + prefix))
+        request.user = user
+        view = viewset(request=request, action='list', args=(), kwargs={},
+                       format_kwarg=None)
+        queryset = backend().filter_queryset(request, view.get_queryset(),
+                                             view)
+        if isinstance(queryset, timeline.HomeTimeline):
+            querysets = queryset.get_querysets()
+        else:
+            querysets = [queryset]
+        return [queryset[:settings.REST_FRAMEWORK['PAGE_SIZE']]
+                for queryset in querysets]
+
+    def find_mysql_problems(self, queryset):
+        """
+        Yields the problems found in the MySQL query plan of `queryset`.
+        """
+        plan = json.loads(queryset.explain(format='json'))
+        filtered = bool(queryset.query.where)
+
+        def walk(node):
+            if isinstance(node, dict):
+                if node.get('using_filesort'):
+                    yield 'uses a filesort'
+                if node.get('using_temporary_table'):
+                    yield 'uses a temporary table'
+                if filtered and node.get('access_type') == 'ALL':
+                    yield 'scans all rows of {}'.format(node.get('table_name'))
+                for value in node.values():
+                    yield from walk(value)
+            elif isinstance(node, list):
+                for value in node:
+                    yield from walk(value)
+
+        return list(walk(plan))
+
+    def find_sqlite_problems(self, queryset):
+        """
+        Yields the problems found in the SQLite query plan of `queryset`.
+        """
+        filtered = bool(queryset.query.where)
+        for line in queryset.explain().splitlines():
+            if 'USE TEMP B-TREE' in line:
+                yield 'uses a temporary b-tree ({})'.format(line.strip())
+            elif filtered and ' SCAN ' in ' {} '.format(line) \
+                    and 'INDEX' not in line:
+                yield 'scans all rows ({})'.format(line.strip())
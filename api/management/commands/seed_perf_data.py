@@ -0,0 +1,437 @@
+"""
+This module contains the `seed_perf_data` management command.
+"""
+
+import contextlib
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from api import constants, models
+
+# Prefix of the usernames and Club names created by this command.
+PREFIX = 'perf'
+
+# Password of every User created by this command.
+PASSWORD = 'perf-password'
+
+
+@contextlib.contextmanager
+def explicit_timestamps(*fields):
+    """
+    Lets `bulk_create` store the given `auto_now_add` fields as set on the
+    objects, instead of overwriting them with the current time.
+    """
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    """
+    Bulk-creates a synthetic institute to measure the API against. Club
+    popularity follows a Zipf-like distribution, so that a few Clubs have
+    most of the members, subscribers and Posts, like in a real institute.
+    Every created User has the password `perf-password`.
+    """
+    help = 'Seeds the database with a synthetic institute.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--clubs', type=int, default=50)
+        parser.add_argument('--secretaries', type=int, default=3)
+        parser.add_argument('--clubs-per-user', type=float, default=2.0,
+                            help='Average number of Clubs joined by a User.')
+        parser.add_argument('--subscriptions-per-user', type=float,
+                            default=5.0,
+                            help='Average number of Channels subscribed by a'
+                                 ' User.')
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--conversations', type=int, default=10000)
+        parser.add_argument('--thread-depth', type=int, default=4)
+        parser.add_argument('--projects', type=int, default=200)
+        parser.add_argument('--feedbacks', type=int, default=2000)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--days', type=int, default=365,
+                            help='Spread the timestamps over this many days.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Seed of the random number generator.')
+        parser.add_argument('--clear', action='store_true',
+                            help='Delete previously seeded data first.')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.days = options['days']
+
+        with transaction.atomic():
+            if options['clear']:
+                self.clear()
+            users = self.create_users(options['users'],
+                                      options['secretaries'])
+            clubs = self.create_clubs(options['clubs'])
+            weights = [1.0 / rank for rank in range(1, len(clubs) + 1)]
+            members = self.create_memberships(users, clubs, weights,
+                                              options['clubs_per_user'])
+            channels = self.create_channels(clubs)
+            self.create_subscriptions(users, channels, members, weights,
+                                      options['subscriptions_per_user'])
+            self.create_posts(channels, weights, options['posts'])
+            self.create_conversations(channels, members, weights,
+                                      options['conversations'],
+                                      options['thread_depth'])
+            self.create_projects(clubs, members, weights, options['projects'])
+            self.create_feedbacks(clubs, members, weights,
+                                  options['feedbacks'])
+            self.create_requests(users, clubs, members, weights,
+                                 options['requests'])
+        self.stdout.write(self.style.SUCCESS('Seeded the database.'))
+
+    def log(self, message, *args):
+        self.stdout.write(message.format(*args))
+
+    def with_members(self, items, members, weights, get_club_id):
+        """
+        Returns the `items` whose Club has members along with their weights.
+        """
+        pairs = [(item, weight) for item, weight in zip(items, weights)
+                 if members[get_club_id(item)]]
+        return [item for item, _ in pairs], [weight for _, weight in pairs]
+
+    def random_time(self):
+        """
+        Returns a random time in the configured period, skewed towards the
+        present.
+        """
+        age = self.random.expovariate(3.0 / self.days)
+        return self.now - timedelta(days=min(age, self.days))
+
+    def bulk_create(self, model, objects):
+        return model.objects.bulk_create(objects, batch_size=self.batch_size)
+
+    def clear(self):
+        """
+        Deletes the Users and Clubs created by a previous run, along with
+        everything depending on them.
+        """
+        prefix = PREFIX + '_'
+        models.Project.objects.filter(
+            owner_club__name__startswith=prefix).delete()
+        models.Club.objects.filter(name__startswith=prefix).delete()
+        get_user_model().objects.filter(username__startswith=prefix).delete()
+        self.log('Deleted previously seeded data.')
+
+    def create_users(self, count, secretaries):
+        password = make_password(PASSWORD)
+        self.bulk_create(get_user_model(), [
+            get_user_model()(
+                username='{}_user_{}'.format(PREFIX, i),
+                email='{}_user_{}@example.com'.format(PREFIX, i),
+                password=password,
+                is_secretary=i < secretaries,
+            ) for i in range(count)
+        ])
+        users = list(get_user_model().objects.filter(
+            username__startswith=PREFIX + '_user_').order_by('id'))
+        self.log('Created {} users.', len(users))
+        return users
+
+    def create_clubs(self, count):
+        self.bulk_create(models.Club, [
+            models.Club(name='{}_club_{}'.format(PREFIX, i),
+                        description='Synthetic club number {}'.format(i))
+            for i in range(count)
+        ])
+        clubs = list(models.Club.objects.filter(
+            name__startswith=PREFIX + '_club_').order_by('id'))
+        self.log('Created {} clubs.', len(clubs))
+        return clubs
+
+    def create_memberships(self, users, clubs, weights, clubs_per_user):
+        """
+        Makes every User, but for a tenth of outsiders, a member of a few
+        Clubs, and the first members of every Club its representatives.
+        Returns a dict mapping the id of every Club to the list of its
+        members.
+        """
+        roles = {}
+        for club in clubs:
+            for privilege in (constants.PRIVILEGE_REP,
+                              constants.PRIVILEGE_MEM):
+                roles[club.id, privilege] = models.ClubRole(
+                    name=constants.DISPLAY_NAME[privilege],
+                    description='{} of {}'.format(
+                        constants.DISPLAY_NAME[privilege], club.name),
+                    club=club,
+                    privilege=privilege,
+                )
+        self.bulk_create(models.ClubRole, list(roles.values()))
+        for role in models.ClubRole.objects.filter(club__in=clubs):
+            roles[role.club_id, role.privilege] = role
+
+        members = {club.id: [] for club in clubs}
+        for user in users:
+            if self.random.random() < 0.1:
+                continue
+            count = min(len(clubs), 1 + int(self.random.expovariate(
+                1.0 / max(clubs_per_user - 1, 0.01))))
+            for club in set(self.random.choices(clubs, weights, k=count)):
+                members[club.id].append(user)
+
+        memberships = []
+        with explicit_timestamps(
+                models.ClubMembership._meta.get_field('joined')):
+            for club_id, club_members in members.items():
+                num_reps = min(len(club_members), self.random.randint(1, 3))
+                for i, user in enumerate(club_members):
+                    privilege = constants.PRIVILEGE_REP if i < num_reps \
+                        else constants.PRIVILEGE_MEM
+                    memberships.append(models.ClubMembership(
+                        user=user,
+                        club_role=roles[club_id, privilege],
+                        joined=self.random_time(),
+                    ))
+            self.bulk_create(models.ClubMembership, memberships)
+        self.log('Created {} club memberships.', len(memberships))
+        return members
+
+    def create_channels(self, clubs):
+        self.bulk_create(models.Channel, [
+            models.Channel(name='{} Channel'.format(club.name),
+                           description='Default channel for {}'.format(
+                               club.name),
+                           club=club)
+            for club in clubs
+        ])
+        channels = list(models.Channel.objects.filter(
+            club__in=clubs).order_by('club_id'))
+        self.log('Created {} channels.', len(channels))
+        return channels
+
+    def create_subscriptions(self, users, channels, members, weights,
+                             subscriptions_per_user):
+        """
+        Subscribes every member to the Channel of its Clubs and every User to
+        a few more popular Channels.
+        """
+        subscribed = set()
+        for channel in channels:
+            for user in members[channel.club_id]:
+                subscribed.add((user.id, channel.id))
+        for user in users:
+            count = int(self.random.expovariate(
+                1.0 / max(subscriptions_per_user, 0.01)))
+            for channel in self.random.choices(channels, weights, k=count):
+                subscribed.add((user.id, channel.id))
+
+        with explicit_timestamps(
+                models.ChannelSubscription._meta.get_field('joined')):
+            self.bulk_create(models.ChannelSubscription, [
+                models.ChannelSubscription(user_id=user_id,
+                                           channel_id=channel_id,
+                                           joined=self.random_time())
+                for user_id, channel_id in subscribed
+            ])
+        crowded_channel_ids = list(models.Channel.objects.filter(
+            id__in=[channel.id for channel in channels],
+        ).annotate(
+            num_subscribers=Count('subscribers'),
+        ).filter(
+            num_subscribers__gt=settings.TIMELINE_FANOUT_MAX_SUBSCRIBERS,
+        ).values_list('id', flat=True))
+        models.Channel.objects.filter(
+            id__in=crowded_channel_ids,
+        ).update(fanout_on_read=True)
+        self.log('Created {} channel subscriptions.', len(subscribed))
+
+    def create_posts(self, channels, weights, count):
+        with explicit_timestamps(models.Post._meta.get_field('created')):
+            self.bulk_create(models.Post, [
+                models.Post(content='Synthetic post {}'.format(i),
+                            channel=channel,
+                            created=self.random_time())
+                for i, channel in enumerate(
+                    self.random.choices(channels, weights, k=count))
+            ])
+        self.log('Created {} posts.', count)
+
+        # Posts created in bulk are not fanned out, fill in the timelines of
+        # the subscribers of Channels which are not read on demand.
+        fanout_channels = models.Channel.objects.filter(
+            id__in=[channel.id for channel in channels],
+            fanout_on_read=False,
+        )
+        subscribers = {}
+        for user_id, channel_id in models.ChannelSubscription.objects.filter(
+                channel__in=fanout_channels).values_list('user_id',
+                                                         'channel_id'):
+            subscribers.setdefault(channel_id, []).append(user_id)
+        entries = []
+        num_entries = 0
+        for post_id, channel_id, created in models.Post.objects.filter(
+                channel__in=fanout_channels).values_list('id', 'channel_id',
+                                                         'created'):
+            for user_id in subscribers.get(channel_id, ()):
+                entries.append(models.TimelineEntry(
+                    user_id=user_id, post_id=post_id, channel_id=channel_id,
+                    created=created))
+            # Do not keep the timelines of all the Users in memory.
+            if len(entries) >= self.batch_size:
+                self.bulk_create(models.TimelineEntry, entries)
+                num_entries += len(entries)
+                entries = []
+        self.bulk_create(models.TimelineEntry, entries)
+        num_entries += len(entries)
+        self.log('Created {} timeline entries.', num_entries)
+
+    def create_conversations(self, channels, members, weights, count,
+                             thread_depth):
+        """
+        Creates threads of Conversations, a third of which are top level and
+        the rest replies at increasing depth.
+        """
+        channels, weights = self.with_members(
+            channels, members, weights, lambda channel: channel.club_id)
+        if not channels:
+            return
+        created = 0
+        parents = []
+        conversation_created = models.Conversation._meta.get_field('created')
+        for depth in range(thread_depth + 1):
+            if depth == 0:
+                level_count = max(1, count // 3)
+            else:
+                level_count = (count - created) // (thread_depth - depth + 1)
+            if level_count <= 0 or (depth and not parents):
+                break
+            conversations = []
+            for i in range(level_count):
+                if depth == 0:
+                    channel = self.random.choices(channels, weights)[0]
+                    parent_id, channel_id, club_id = \
+                        None, channel.id, channel.club_id
+                else:
+                    parent_id, channel_id, club_id = \
+                        self.random.choice(parents)
+                conversations.append(models.Conversation(
+                    content='Synthetic conversation {}'.format(created + i),
+                    channel_id=channel_id,
+                    author=self.random.choice(members[club_id]),
+                    parent_id=parent_id,
+                    created=self.random_time(),
+                ))
+            with explicit_timestamps(conversation_created):
+                self.bulk_create(models.Conversation, conversations)
+            created += level_count
+            parents = list(models.Conversation.objects.filter(
+                channel__in=channels,
+            ).order_by('-id').values_list(
+                'id', 'channel_id', 'channel__club_id')[:level_count])
+        self.log('Created {} conversations.', created)
+
+    def create_projects(self, clubs, members, weights, count):
+        clubs, weights = self.with_members(clubs, members, weights,
+                                           lambda club: club.id)
+        if not clubs:
+            return
+        projects = []
+        for i, club in enumerate(self.random.choices(clubs, weights,
+                                                     k=count)):
+            projects.append(models.Project(
+                name='{}_project_{}'.format(PREFIX, i),
+                description='Synthetic project number {}'.format(i),
+                owner_club=club,
+                leader=self.random.choice(members[club.id]),
+            ))
+        self.bulk_create(models.Project, projects)
+        projects = list(models.Project.objects.filter(
+            owner_club__in=clubs, name__startswith=PREFIX + '_project_'))
+
+        club_projects = []
+        project_memberships = []
+        for project in projects:
+            collaborators = {project.owner_club_id}
+            for club in self.random.sample(clubs, min(len(clubs), 2)):
+                if club.id not in collaborators:
+                    collaborators.add(club.id)
+                    club_projects.append(models.ClubProject(
+                        club=club, project=project))
+            for club_id in collaborators:
+                club_members = members[club_id]
+                for user in self.random.sample(
+                        club_members, min(len(club_members), 3)):
+                    project_memberships.append(models.ProjectMembership(
+                        user=user, club_id=club_id, project=project))
+        self.bulk_create(models.ClubProject, club_projects)
+        self.bulk_create(models.ProjectMembership, project_memberships)
+        self.log('Created {} projects.', len(projects))
+
+    def create_feedbacks(self, clubs, members, weights, count):
+        clubs, weights = self.with_members(clubs, members, weights,
+                                           lambda club: club.id)
+        if not clubs:
+            return
+        feedback_created = models.Feedback._meta.get_field('created')
+        with explicit_timestamps(feedback_created):
+            self.bulk_create(models.Feedback, [
+                models.Feedback(
+                    content='Synthetic feedback {}'.format(i),
+                    club=club,
+                    author=self.random.choice(members[club.id]),
+                    created=self.random_time(),
+                ) for i, club in enumerate(self.random.choices(
+                    clubs, weights, k=count))
+            ])
+        feedback_ids = models.Feedback.objects.filter(
+            club__in=clubs,
+        ).values_list('id', flat=True)
+        replied = [feedback_id for feedback_id in feedback_ids
+                   if self.random.random() < 0.5]
+        reply_created = models.FeedbackReply._meta.get_field('created')
+        with explicit_timestamps(reply_created):
+            self.bulk_create(models.FeedbackReply, [
+                models.FeedbackReply(content='Synthetic reply',
+                                     parent_id=feedback_id,
+                                     created=self.now)
+                for feedback_id in replied
+            ])
+        self.log('Created {} feedbacks and {} replies.', count, len(replied))
+
+    def create_requests(self, users, clubs, members, weights, count):
+        member_ids = {club_id: {user.id for user in club_members}
+                      for club_id, club_members in members.items()}
+        statuses = [status for status, _ in
+                    models.ClubMembershipRequest.STATUS_CHOICES]
+        requests = []
+        for _ in range(count):
+            user = self.random.choice(users)
+            club = self.random.choices(clubs, weights)[0]
+            if user.id in member_ids[club.id]:
+                continue
+            status = self.random.choice(statuses)
+            initiated = self.random_time()
+            requests.append(models.ClubMembershipRequest(
+                user=user,
+                club=club,
+                status=status,
+                initiated=initiated,
+                closed=None if status == constants.REQUEST_STATUS_PENDING
+                else initiated,
+            ))
+        initiated = models.ClubMembershipRequest._meta.get_field('initiated')
+        with explicit_timestamps(initiated):
+            self.bulk_create(models.ClubMembershipRequest, requests)
+        self.log('Created {} club membership requests.', len(requests))
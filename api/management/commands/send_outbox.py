@@ -0,0 +1,120 @@
+"""
+This module contains the `send_outbox` management command.
+"""
+
+import datetime
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from api import constants, models
+
+
+class Command(BaseCommand):
+    """
+    Sends the OutboxEmails queued by `api.mail.OutboxEmailBackend` with
+    `OUTBOX_EMAIL_BACKEND`, in batches over a single connection which is
+    kept open as long as there are emails to send.
+
+    An email that can not be sent is tried again after `OUTBOX_RETRY_DELAY`
+    seconds, doubled on every attempt, and given up after
+    `OUTBOX_MAX_ATTEMPTS` attempts. A batch is claimed by moving its next
+    attempt past `OUTBOX_CLAIM_TIMEOUT` seconds, so that several workers can
+    run at once. To try it, print the emails with `--backend
+    django.core.mail.backends.console.EmailBackend`, or use e.g. `python -m
+    aiosmtpd -n -l localhost:1025` from the aiosmtpd package as a local SMTP
+    server.
+    """
+    help = 'Sends the queued emails.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=settings.OUTBOX_BATCH_SIZE,
+                            help='Number of emails claimed at once.')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep waiting for new emails instead of'
+                                 ' exiting once the outbox is empty.')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Number of seconds to wait for new emails'
+                                 ' with --loop.')
+        parser.add_argument('--backend',
+                            default=settings.OUTBOX_EMAIL_BACKEND,
+                            help='Email backend to send the emails with.')
+
+    def handle(self, *args, **options):
+        connection = get_connection(options['backend'])
+        sent = failed = 0
+        while True:
+            emails = self.claim_batch(options['batch_size'])
+            if emails:
+                batch_sent, batch_failed = self.send_batch(connection,
+                                                           emails)
+                sent += batch_sent
+                failed += batch_failed
+                continue
+
+            # Do not keep the connection open while the outbox is empty.
+            connection.close()
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(
+            'Sent {} email(s), {} attempt(s) failed.'.format(sent, failed)))
+
+    def claim_batch(self, batch_size):
+        """
+        Returns up to `batch_size` queued OutboxEmails which are due, after
+        moving their next attempt past `OUTBOX_CLAIM_TIMEOUT` so that other
+        workers do not claim them too.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            emails = list(models.OutboxEmail.objects.filter(
+                status=constants.EMAIL_STATUS_QUEUED,
+                next_attempt__lte=now,
+            ).order_by('next_attempt').select_for_update()[:batch_size])
+            models.OutboxEmail.objects.filter(
+                id__in=[email.id for email in emails],
+            ).update(next_attempt=now + datetime.timedelta(
+                seconds=settings.OUTBOX_CLAIM_TIMEOUT))
+        return emails
+
+    def send_batch(self, connection, emails):
+        """
+        Sends `emails` with `connection`, records the result of every attempt
+        and returns the numbers of sent emails and of failed attempts.
+        """
+        sent = failed = 0
+        for email in emails:
+            email.attempts += 1
+            try:
+                # Open the connection beforehand, otherwise the backend
+                # closes it after every email.
+                connection.open()
+                connection.send_messages([email.to_message(connection)])
+            except Exception as error:
+                failed += 1
+                # The connection may be broken, open a new one for the next.
+                connection.close()
+                email.last_error = '{}: {}'.format(type(error).__name__,
+                                                   error)
+                if email.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                    email.status = constants.EMAIL_STATUS_FAILED
+                    self.stderr.write('Giving up on email {}: {}'.format(
+                        email.id, email.last_error))
+                email.next_attempt = timezone.now() + datetime.timedelta(
+                    seconds=settings.OUTBOX_RETRY_DELAY *
+                    2 ** (email.attempts - 1))
+            else:
+                sent += 1
+                email.status = constants.EMAIL_STATUS_SENT
+                email.sent = timezone.now()
+                email.last_error = ''
+            email.save(update_fields=['attempts', 'status', 'next_attempt',
+                                      'last_error', 'sent'])
+        return sent, failed
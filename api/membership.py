@@ -0,0 +1,151 @@
+"""
+This module contains the request-scoped cache of a User's memberships.
+
+A MembershipContext is attached to `request.user` the first time it is asked
+for and loads the User's privileges and subscriptions lazily, once per
+request. Every live context of a User is invalidated by the signal receivers
+in `api.signals` whenever the memberships of that User change.
+"""
+
+import threading
+import weakref
+
+from . import constants, models
+
+# Name of the attribute used to attach the context to a User instance.
+CONTEXT_ATTR = '_membership_context'
+
+_live_contexts = weakref.WeakSet()
+_live_contexts_lock = threading.Lock()
+
+
+class MembershipContext(object):
+    """
+    Answers membership related checks for a single User from memory.
+    """
+
+    def __init__(self, user):
+        self.user_id = user.id
+        self.is_secretary = getattr(user, 'is_secretary', False)
+        self._privileges = None
+        self._subscribed_channel_ids = None
+        with _live_contexts_lock:
+            _live_contexts.add(self)
+
+    @property
+    def privileges(self):
+        """
+        Returns a dict that maps the id of every Club that the User is a
+        member of to the highest privilege of the User in that Club.
+        """
+        # Read the attribute once, as another thread may invalidate it
+        privileges = self._privileges
+        if privileges is None:
+            privileges = {}
+            memberships = models.ClubMembership.objects.filter(
+                user__id=self.user_id,
+            ).values_list('club_role__club_id', 'club_role__privilege')
+            for club_id, privilege in memberships:
+                if privileges.get(club_id) != constants.PRIVILEGE_REP:
+                    privileges[club_id] = privilege
+            self._privileges = privileges
+        return privileges
+
+    @property
+    def subscribed_channel_ids(self):
+        """
+        Returns the set of ids of all the Channels subscribed by the User.
+        """
+        ids = self._subscribed_channel_ids
+        if ids is None:
+            ids = set(models.ChannelSubscription.objects.filter(
+                user__id=self.user_id,
+            ).values_list('channel_id', flat=True))
+            self._subscribed_channel_ids = ids
+        return ids
+
+    def set_privileges(self, privileges):
+        """
+        Uses `privileges`, a dict like the one returned by `privileges`, e.g.
+        read from a signed access token, instead of loading them.
+        """
+        self._privileges = dict(privileges)
+
+    def get_privilege(self, club_id):
+        """
+        Returns the privilege of the User in the Club with id `club_id`, None
+        if the User is not a member of it.
+        """
+        return self.privileges.get(club_id)
+
+    def is_member(self, club_id):
+        """
+        Returns True if the User is a member of the Club with id `club_id`,
+        False otherwise.
+        """
+        return club_id in self.privileges
+
+    def is_member_of_any(self, club_ids):
+        """
+        Returns True if the User is a member of at least one of the Clubs
+        with ids in `club_ids`, False otherwise.
+        """
+        return any(club_id in self.privileges for club_id in club_ids)
+
+    def is_rep(self, club_id):
+        """
+        Returns True if the User is a representative of the Club with id
+        `club_id`, False otherwise.
+        """
+        return self.privileges.get(club_id) == constants.PRIVILEGE_REP
+
+    def is_subscribed(self, channel_id):
+        """
+        Returns True if the User has subscribed to the Channel with id
+        `channel_id`, False otherwise.
+        """
+        return channel_id in self.subscribed_channel_ids
+
+    def fingerprint(self):
+        """
+        Returns a string which changes whenever the privileges or the
+        subscriptions of the User change.
+        """
+        return '{}:{}:{}:{}'.format(
+            self.user_id,
+            self.is_secretary,
+            sorted(self.privileges.items()),
+            sorted(self.subscribed_channel_ids),
+        )
+
+    def invalidate(self):
+        """
+        Drops everything loaded so far so that it is loaded again on next
+        access.
+        """
+        self._privileges = None
+        self._subscribed_channel_ids = None
+
+
+def get_context(user):
+    """
+    Returns the MembershipContext attached to `user`, attaching a new one if
+    there is none yet.
+    """
+    context = getattr(user, CONTEXT_ATTR, None)
+    if context is None:
+        context = MembershipContext(user)
+        setattr(user, CONTEXT_ATTR, context)
+    return context
+
+
+def invalidate(user_id=None):
+    """
+    Invalidates all live contexts of the User with id `user_id`, or of all
+    Users if `user_id` is None.
+    """
+    with _live_contexts_lock:
+        contexts = list(_live_contexts)
+    for context in contexts:
+        if user_id is None or context.user_id == user_id:
+            context.invalidate()
@@ -0,0 +1,19 @@
+# Generated by Django 3.1.14 on 2026-10-18 10:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='clubmembership',
+            index=models.Index(fields=['user', 'club_role'], name='api_clubmem_user_role_idx'),
+        ),
+    ]
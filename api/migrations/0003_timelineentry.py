@@ -0,0 +1,69 @@
+# Generated by Django 3.1.14 on 2026-10-18 11:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_timelines(apps, schema_editor):
+    """
+    Write the existing Posts to the timelines of the current subscribers.
+    """
+    Channel = apps.get_model('api', 'Channel')
+    ChannelSubscription = apps.get_model('api', 'ChannelSubscription')
+    Post = apps.get_model('api', 'Post')
+    TimelineEntry = apps.get_model('api', 'TimelineEntry')
+
+    for channel in Channel.objects.all():
+        subscriber_ids = list(ChannelSubscription.objects.filter(
+            channel=channel,
+        ).values_list('user_id', flat=True))
+        if len(subscriber_ids) > settings.TIMELINE_FANOUT_MAX_SUBSCRIBERS:
+            channel.fanout_on_read = True
+            channel.save(update_fields=['fanout_on_read'])
+            continue
+        posts = list(Post.objects.filter(
+            channel=channel,
+        ).values_list('id', 'created'))
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(user_id=user_id, post_id=post_id,
+                           channel=channel, created=created)
+             for user_id in subscriber_ids
+             for post_id, created in posts],
+            batch_size=settings.TIMELINE_BATCH_SIZE,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0002_clubmembership_user_role_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='channel',
+            name='fanout_on_read',
+            field=models.BooleanField(default=False, help_text='Designates whether Posts of this Channel are read on demand instead of being written to the timelines of its subscribers.'),
+        ),
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField()),
+                ('channel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.Channel')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.Post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', 'created', 'post'], name='api_timeline_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', 'channel'], name='api_timeline_user_channel_idx'),
+        ),
+        migrations.RunPython(backfill_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 3.1.14 on 2026-10-18 11:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0003_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='clubmembershiprequest',
+            index=models.Index(fields=['club', 'status', 'initiated'], name='api_request_club_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clubmembershiprequest',
+            index=models.Index(fields=['user', 'status'], name='api_request_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clubrole',
+            index=models.Index(fields=['club', 'privilege'], name='api_clubrole_club_priv_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='channelsubscription',
+            index=models.Index(fields=['user', 'channel'], name='api_chansub_user_channel_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['channel', 'created'], name='api_post_channel_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['channel', 'parent', 'created'], name='api_conv_chan_parent_crtd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['club', 'created'], name='api_feedback_club_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feedbackreply',
+            index=models.Index(fields=['created'], name='api_reply_created_idx'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 3.1.14 on 2026-10-18 12:30
+
+from django.db import migrations
+
+# Tables whose `content` column is searched by api.search.
+SEARCHED_TABLES = ('api_post', 'api_conversation')
+
+SQLITE_FORWARD = [
+    'CREATE VIRTUAL TABLE {table}_fts USING fts5('
+    'content, content={table}, content_rowid=id)',
+    "INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')",
+    'CREATE TRIGGER {table}_fts_ai AFTER INSERT ON {table} BEGIN '
+    'INSERT INTO {table}_fts(rowid, content) VALUES (new.id, new.content); '
+    'END',
+    'CREATE TRIGGER {table}_fts_ad AFTER DELETE ON {table} BEGIN '
+    "INSERT INTO {table}_fts({table}_fts, rowid, content) "
+    "VALUES ('delete', old.id, old.content); "
+    'END',
+    'CREATE TRIGGER {table}_fts_au AFTER UPDATE ON {table} BEGIN '
+    "INSERT INTO {table}_fts({table}_fts, rowid, content) "
+    "VALUES ('delete', old.id, old.content); "
+    'INSERT INTO {table}_fts(rowid, content) VALUES (new.id, new.content); '
+    'END',
+]
+
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS {table}_fts_au',
+    'DROP TRIGGER IF EXISTS {table}_fts_ad',
+    'DROP TRIGGER IF EXISTS {table}_fts_ai',
+    'DROP TABLE IF EXISTS {table}_fts',
+]
+
+MYSQL_FORWARD = [
+    'ALTER TABLE {table} ADD FULLTEXT INDEX {table}_content_ft (content)',
+]
+
+MYSQL_BACKWARD = [
+    'ALTER TABLE {table} DROP INDEX {table}_content_ft',
+]
+
+
+def run_statements(statements_by_vendor):
+    """
+    Returns a RunPython function executing the statements for the vendor of
+    the database being migrated, for each of the searched tables.
+    """
+    def run(apps, schema_editor):
+        statements = statements_by_vendor.get(
+            schema_editor.connection.vendor, [])
+        for table in SEARCHED_TABLES:
+            for statement in statements:
+                schema_editor.execute(statement.format(table=table))
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_statements({'sqlite': SQLITE_FORWARD,
+                            'mysql': MYSQL_FORWARD}),
+            run_statements({'sqlite': SQLITE_BACKWARD,
+                            'mysql': MYSQL_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.1.14 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_content_fulltext_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='channel',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='club',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.14 on 2026-10-18 20:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_outboxemail'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='clubproject',
+            index=models.Index(fields=['club', 'project'], name='api_clubproject_club_proj_idx'),
+        ),
+    ]
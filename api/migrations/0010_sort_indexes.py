@@ -0,0 +1,33 @@
+# Generated by Django 3.1.14 on 2026-10-18 20:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_clubproject_club_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='clubmembershiprequest',
+            index=models.Index(fields=['initiated'], name='api_request_initiated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clubmembershiprequest',
+            index=models.Index(fields=['user', 'initiated'], name='api_request_user_initiated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['parent', 'created'], name='api_conv_parent_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['created'], name='api_feedback_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['author', 'created'], name='api_feedback_author_crtd_idx'),
+        ),
+    ]
@@ -8,7 +8,9 @@ from datetime import datetime
 
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
-from django.db import models, transaction
+from django.core.mail import EmailMultiAlternatives
+from django.db import connection, models, transaction
+from django.utils import timezone
 
 from . import constants, exceptions
 
@@ -31,6 +33,7 @@ class Club(models.Model):
     name = models.CharField(max_length=100, blank=False)
     description = models.TextField()
     requests = models.ManyToManyField(settings.AUTH_USER_MODEL, through='ClubMembershipRequest')
+    updated = models.DateTimeField(auto_now=True)
 
     def __unicode__(self):
         return self.name
@@ -126,6 +129,18 @@ class ClubMembershipRequest(models.Model):
                               default=constants.REQUEST_STATUS_PENDING)
     closed = models.DateTimeField(default=None, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['club', 'status', 'initiated'],
+                         name='api_request_club_status_idx'),
+            models.Index(fields=['user', 'status'],
+                         name='api_request_user_status_idx'),
+            models.Index(fields=['initiated'],
+                         name='api_request_initiated_idx'),
+            models.Index(fields=['user', 'initiated'],
+                         name='api_request_user_initiated_idx'),
+        ]
+
     def __unicode__(self):
         return '{} requested membership in {} on {} : {}'.format(
             self.user, self.club, self.initiated, self.get_status_display())
@@ -207,6 +222,12 @@ class ClubRole(models.Model):
     privilege = models.CharField(max_length=3, choices=PRIVILEGE_CHOICES,
                                  blank=False, default=constants.PRIVILEGE_MEM)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['club', 'privilege'],
+                         name='api_clubrole_club_priv_idx'),
+        ]
+
     def __unicode__(self):
         return '{} in {}'.format(self.name, self.club)
 
@@ -220,6 +241,12 @@ class ClubMembership(models.Model):
                                   blank=False)
     joined = models.DateTimeField(auto_now_add=True, blank=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'club_role'],
+                         name='api_clubmem_user_role_idx'),
+        ]
+
     def __unicode__(self):
         return '{} is {} since {}'.format(self.user, self.club_role,
                                           self.joined)
@@ -240,6 +267,7 @@ class Project(models.Model):
                                related_name='lead_projects')
     members = models.ManyToManyField(settings.AUTH_USER_MODEL, through='ProjectMembership')
     clubs = models.ManyToManyField('Club', through='ClubProject')
+    updated = models.DateTimeField(auto_now=True)
 
     def __unicode__(self):
         return str(self.name)
@@ -270,6 +298,17 @@ class Project(models.Model):
                    club_role__club__in=self.clubs.all()
                ).exists()
 
+    def get_club_ids(self):
+        """
+        Returns a list of ids of the owner Club and all collaborating Clubs of
+        this Project. Uses the ClubProjects prefetched with
+        `prefetch_related('clubproject_set')`, if any.
+        """
+        return [self.owner_club_id] + [
+            club_project.club_id
+            for club_project in self.clubproject_set.all()
+        ]
+
     def num_collaborating_clubs(self):
         """
         Return the number of collaborating Clubs of this Project (excludes the
@@ -341,6 +380,12 @@ class ClubProject(models.Model):
     project = models.ForeignKey('Project', on_delete=models.CASCADE,
                                 blank=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['club', 'project'],
+                         name='api_clubproject_club_proj_idx'),
+        ]
+
     def __unicode__(self):
         return '{} has undertaken {}'.format(self.club, self.project)
 
@@ -359,6 +404,22 @@ class ProjectMembership(models.Model):
         return '{} from {} is working on {}'.format(self.user, self.club,
                                                     self.project)
 
+    def save(self, *args, **kwargs):
+        """
+        Override save() to mark the Project as updated, since its members
+        are part of it, in the same transaction.
+        """
+        with transaction.atomic():
+            super(ProjectMembership, self).save(*args, **kwargs)
+            self.touch_project()
+
+    def touch_project(self):
+        """
+        Sets the `updated` time of the Project of this membership to now.
+        """
+        Project.objects.filter(pk=self.project_id).update(
+            updated=timezone.now())
+
 
 class Channel(models.Model):
     """
@@ -368,6 +429,13 @@ class Channel(models.Model):
     description = models.TextField()
     club = models.OneToOneField('Club', on_delete=models.CASCADE, blank=False)
     subscribers = models.ManyToManyField(settings.AUTH_USER_MODEL, through='ChannelSubscription')
+    fanout_on_read = models.BooleanField(
+        default=False,
+        help_text='Designates whether Posts of this Channel are read on '
+                  'demand instead of being written to the timelines of its '
+                  'subscribers.',
+    )
+    updated = models.DateTimeField(auto_now=True)
 
     def __unicode__(self):
         return '{} : {}'.format(self.name, self.club)
@@ -384,8 +452,10 @@ class Channel(models.Model):
 
     def subscribe(self, user):
         """
-        Subscribe `user` to this Channel.
-        Safe to use even if the `user` has already subscribed.
+        Subscribe `user` to this Channel. Safe to use even if the `user` has
+        already subscribed. The Posts of this Channel are added to the
+        timeline of `user` by `add_to_timeline()` once the subscription is
+        saved.
         """
         ChannelSubscription.objects.get_or_create(
             user=user,
@@ -394,14 +464,59 @@ class Channel(models.Model):
 
     def unsubscribe(self, user):
         """
-        Unsubscribe `user` from this Channel.
-        Safe to use even if the `user` has not subscribed.
+        Unsubscribe `user` from this Channel. Safe to use even if the `user`
+        has not subscribed. The Posts of this Channel are removed from the
+        timeline of `user` once the subscription is deleted.
         """
         ChannelSubscription.objects.filter(
             user=user,
             channel=self,
         ).delete()
 
+    def add_to_timeline(self, user_id):
+        """
+        Add the Posts of this Channel to the timeline of the User with id
+        `user_id`, who has just subscribed to it, unless the Posts of this
+        Channel are read on demand.
+        """
+        if self.fanout_on_read:
+            return
+        with transaction.atomic():
+            if self.subscribers.count() > \
+                    settings.TIMELINE_FANOUT_MAX_SUBSCRIBERS:
+                # Too many subscribers to write every Post to each of their
+                # timelines, read the Posts of this Channel on demand instead.
+                self.fanout_on_read = True
+                self.save(update_fields=['fanout_on_read'])
+                TimelineEntry.objects.filter(channel=self).delete()
+                return
+            posts = Post.objects.filter(
+                channel=self,
+            ).values_list('id', 'created')
+            TimelineEntry.objects.bulk_create(
+                [TimelineEntry(user_id=user_id, post_id=post_id,
+                               channel=self, created=created)
+                 for post_id, created in posts],
+                batch_size=settings.TIMELINE_BATCH_SIZE,
+            )
+
+    def fan_out(self, post):
+        """
+        Add `post` to the timelines of all the subscribers of this Channel,
+        unless the Posts of this Channel are read on demand.
+        """
+        if self.fanout_on_read:
+            return
+        subscriber_ids = ChannelSubscription.objects.filter(
+            channel=self,
+        ).values_list('user_id', flat=True)
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(user_id=user_id, post=post, channel=self,
+                           created=post.created)
+             for user_id in subscriber_ids],
+            batch_size=settings.TIMELINE_BATCH_SIZE,
+        )
+
 
 class ChannelSubscription(models.Model):
     """
@@ -412,6 +527,12 @@ class ChannelSubscription(models.Model):
                                 blank=False)
     joined = models.DateTimeField(auto_now_add=True, blank=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'channel'],
+                         name='api_chansub_user_channel_idx'),
+        ]
+
     def __unicode__(self):
         return '{} subscribes to {}'.format(self.user, self.channel)
 
@@ -425,9 +546,66 @@ class Post(models.Model):
     channel = models.ForeignKey('Channel', on_delete=models.CASCADE,
                                 blank=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['channel', 'created'],
+                         name='api_post_channel_created_idx'),
+        ]
+
     def __unicode__(self):
         return 'Post in {} at {}'.format(self.channel, self.created)
 
+    def save(self, *args, **kwargs):
+        """
+        Override save() to make sure that whenever a new Post is created, it
+        is added to the timelines of the subscribers of its Channel, and
+        moved to the timelines of the subscribers of its new Channel whenever
+        it is moved to another Channel.
+        """
+        if not self.pk:
+            with transaction.atomic():
+                super(Post, self).save(*args, **kwargs)
+                self.channel.fan_out(self)
+            return
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'channel' not in update_fields \
+                and 'channel_id' not in update_fields:
+            super(Post, self).save(*args, **kwargs)
+            return
+        with transaction.atomic():
+            previous_channel_id = Post.objects.filter(
+                pk=self.pk,
+            ).values_list('channel_id', flat=True).first()
+            super(Post, self).save(*args, **kwargs)
+            if previous_channel_id != self.channel_id:
+                TimelineEntry.objects.filter(post=self).delete()
+                self.channel.fan_out(self)
+
+
+class TimelineEntry(models.Model):
+    """
+    Model to represent a Post in the home timeline of a User. The Channel and
+    the creation time of the Post are copied here so that a timeline can be
+    read and pruned using the indexes of this table alone.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, blank=False)
+    post = models.ForeignKey('Post', on_delete=models.CASCADE, blank=False)
+    channel = models.ForeignKey('Channel', on_delete=models.CASCADE,
+                                blank=False)
+    created = models.DateTimeField(blank=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created', 'post'],
+                         name='api_timeline_user_created_idx'),
+            models.Index(fields=['user', 'channel'],
+                         name='api_timeline_user_channel_idx'),
+        ]
+
+    def __unicode__(self):
+        return '{} in timeline of {}'.format(self.post, self.user)
+
 
 class Conversation(models.Model):
     """
@@ -441,10 +619,54 @@ class Conversation(models.Model):
     parent = models.ForeignKey('Conversation', on_delete=models.CASCADE,
                                default=None, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['channel', 'parent', 'created'],
+                         name='api_conv_chan_parent_crtd_idx'),
+            models.Index(fields=['parent', 'created'],
+                         name='api_conv_parent_created_idx'),
+        ]
+
     def __unicode__(self):
         return 'Conversation in {} by {} at {}'.format(
             self.channel, self.author, self.created)
 
+    def get_thread(self, max_depth=None):
+        """
+        Returns a list of this Conversation and all of its replies at any
+        depth, or only up to `max_depth` levels of replies if given, using a
+        single recursive query. The list is ordered by depth and then by
+        creation time, and each Conversation in it has a `depth` attribute
+        which is 0 for this Conversation.
+        """
+        quote_name = connection.ops.quote_name
+        depth_condition = ''
+        params = [self.pk]
+        if max_depth is not None:
+            depth_condition = 'WHERE thread.depth < %s'
+            params.append(max_depth)
+        query = '''
+            WITH RECURSIVE thread (id, depth) AS (
+                SELECT {id}, 0 FROM {table} WHERE {id} = %s
+                UNION ALL
+                SELECT child.{id}, thread.depth + 1
+                FROM {table} child
+                INNER JOIN thread ON child.{parent} = thread.id
+                {depth_condition}
+            )
+            SELECT conversation.*, thread.depth
+            FROM {table} conversation
+            INNER JOIN thread ON conversation.{id} = thread.id
+            ORDER BY thread.depth, conversation.{created}, conversation.{id}
+        '''.format(
+            table=quote_name(self._meta.db_table),
+            id=quote_name(self._meta.pk.column),
+            parent=quote_name(self._meta.get_field('parent').column),
+            created=quote_name(self._meta.get_field('created').column),
+            depth_condition=depth_condition,
+        )
+        return list(Conversation.objects.raw(query, params))
+
 
 class Feedback(models.Model):
     """
@@ -455,6 +677,16 @@ class Feedback(models.Model):
     club = models.ForeignKey('Club', on_delete=models.CASCADE, blank=False)
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, blank=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['club', 'created'],
+                         name='api_feedback_club_created_idx'),
+            models.Index(fields=['created'],
+                         name='api_feedback_created_idx'),
+            models.Index(fields=['author', 'created'],
+                         name='api_feedback_author_crtd_idx'),
+        ]
+
     def __unicode__(self):
         return 'Feedback for {} by {}'.format(self.club, self.author)
 
@@ -483,5 +715,115 @@ class FeedbackReply(models.Model):
     parent = models.OneToOneField('Feedback', on_delete=models.CASCADE,
                                   blank=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created'], name='api_reply_created_idx'),
+        ]
+
     def __unicode__(self):
         return 'Reply to {}'.format(self.parent)
+
+
+class RefreshToken(models.Model):
+    """
+    Model to represent a refresh token, used to get new signed access tokens
+    for a User. Only a hash of the token is stored.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                             blank=False, related_name='refresh_tokens')
+    key_hash = models.CharField(max_length=64, unique=True, blank=False)
+    session_hash = models.CharField(
+        max_length=128,
+        blank=False,
+        help_text='Session auth hash of the User when the token was issued, '
+                  'which changes with the password.',
+    )
+    created = models.DateTimeField(auto_now_add=True, blank=False)
+    expires = models.DateTimeField(blank=False)
+
+    def __unicode__(self):
+        return 'Refresh token of {} until {}'.format(self.user, self.expires)
+
+
+class OutboxEmail(models.Model):
+    """
+    Model to represent an email queued by `api.mail.OutboxEmailBackend`,
+    until the `send_outbox` management command sends it.
+    """
+    STATUS_CHOICES = (
+        (constants.EMAIL_STATUS_QUEUED,
+         constants.DISPLAY_NAME[constants.EMAIL_STATUS_QUEUED]),
+        (constants.EMAIL_STATUS_SENT,
+         constants.DISPLAY_NAME[constants.EMAIL_STATUS_SENT]),
+        (constants.EMAIL_STATUS_FAILED,
+         constants.DISPLAY_NAME[constants.EMAIL_STATUS_FAILED]),
+    )
+    subject = models.TextField(blank=True)
+    body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254, blank=False)
+    to = models.JSONField(default=list, blank=True)
+    cc = models.JSONField(default=list, blank=True)
+    bcc = models.JSONField(default=list, blank=True)
+    reply_to = models.JSONField(default=list, blank=True)
+    headers = models.JSONField(default=dict, blank=True)
+    alternatives = models.JSONField(
+        default=list,
+        blank=True,
+        help_text='List of [content, mimetype] pairs, e.g. an HTML version.',
+    )
+    status = models.CharField(max_length=2, choices=STATUS_CHOICES,
+                              blank=False,
+                              default=constants.EMAIL_STATUS_QUEUED)
+    attempts = models.PositiveIntegerField(default=0, blank=False)
+    next_attempt = models.DateTimeField(default=timezone.now, blank=False)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True, blank=False)
+    sent = models.DateTimeField(default=None, blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt'],
+                         name='api_outbox_status_next_idx'),
+        ]
+
+    def __unicode__(self):
+        return '{} to {}'.format(self.subject, ', '.join(self.to))
+
+    @classmethod
+    def from_message(cls, message):
+        """
+        Returns a new, unsaved OutboxEmail for the EmailMessage `message`.
+        """
+        if message.attachments:
+            raise ValueError('Emails with attachments can not be queued.')
+        return cls(
+            subject=message.subject,
+            body=message.body,
+            from_email=message.from_email,
+            to=list(message.to),
+            cc=list(message.cc),
+            bcc=list(message.bcc),
+            reply_to=list(message.reply_to),
+            headers=dict(message.extra_headers),
+            alternatives=[list(alternative) for alternative in
+                          getattr(message, 'alternatives', [])],
+        )
+
+    def to_message(self, connection=None):
+        """
+        Returns the EmailMessage of this OutboxEmail, to be sent with
+        `connection`.
+        """
+        return EmailMultiAlternatives(
+            subject=self.subject,
+            body=self.body,
+            from_email=self.from_email,
+            to=self.to,
+            cc=self.cc,
+            bcc=self.bcc,
+            reply_to=self.reply_to,
+            headers=self.headers,
+            alternatives=[tuple(alternative)
+                          for alternative in self.alternatives],
+            connection=connection,
+        )
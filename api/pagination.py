@@ -0,0 +1,156 @@
+"""
+This module contains the custom Pagination classes needed for this app.
+"""
+
+import coreapi
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.pagination import (CursorPagination, LimitOffsetPagination,
+                                       _reverse_ordering)
+
+
+class TimelineCursorPagination(CursorPagination):
+    """
+    Cursor pagination keyed on the `timeline_field` of the view and the id.
+    Unlike CursorPagination, which only keeps the first ordering field in the
+    cursor along with an offset among the objects sharing its value, the
+    cursor holds both values, and pages start right after the object with
+    that (`timeline_field`, id) position. It respects the `order` query
+    parameter accepted by the filters and does not count the total number
+    of results.
+    """
+    page_size_query_param = 'limit'
+    position_separator = '|'
+
+    def get_ordering(self, request, queryset, view):
+        try:
+            order = int(request.query_params.get('order', -1))
+        except ValueError:
+            raise ParseError
+        if order == -1:
+            return ('-' + view.timeline_field, '-id')
+        return (view.timeline_field, 'id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            queryset = queryset.filter(self.get_position_filter(
+                current_position, reverse))
+
+        # Fetch an extra object to know whether there is a following page
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(
+                results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            # The page was read backwards, put it back in order
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_position_filter(self, position, reverse):
+        """
+        Returns a Q object selecting the objects after `position` in the
+        ordering, or before it if `reverse` is true.
+        """
+        try:
+            value, pk = position.rsplit(self.position_separator, 1)
+            pk = int(pk)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        field = self.ordering[0].lstrip('-')
+        # Test for: (cursor reversed) XOR (queryset reversed)
+        if reverse != self.ordering[0].startswith('-'):
+            lookup = '__lt'
+        else:
+            lookup = '__gt'
+        return Q(**{field + lookup: value}) \
+            | Q(**{field: value, 'id' + lookup: pk})
+
+    def _get_position_from_instance(self, instance, ordering):
+        field = ordering[0].lstrip('-')
+        if isinstance(instance, dict):
+            value, pk = instance[field], instance['id']
+        else:
+            value, pk = getattr(instance, field), instance.pk
+        return '{}{}{}'.format(value, self.position_separator, pk)
+
+
+class TimelinePagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination by default, which switches to
+    TimelineCursorPagination if the request asks for it by setting the
+    `pagination` query parameter to `cursor`.
+    """
+    mode_query_param = 'pagination'
+    cursor_mode = 'cursor'
+
+    def __init__(self):
+        self.cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(self.mode_query_param) == self.cursor_mode:
+            self.cursor_paginator = TimelineCursorPagination()
+            return self.cursor_paginator.paginate_queryset(queryset, request,
+                                                           view)
+        return super(TimelinePagination, self).paginate_queryset(
+            queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super(TimelinePagination, self).get_paginated_response(data)
+
+    def get_schema_fields(self, view):
+        return super(TimelinePagination, self).get_schema_fields(view) + [
+            coreapi.Field(name=self.mode_query_param, location='query',
+                          required=False,
+                          description='Use cursor pagination instead of'
+                                      + ' limit/offset if set to "cursor".',
+                          type='string'),
+            coreapi.Field(name=TimelineCursorPagination.cursor_query_param,
+                          location='query', required=False,
+                          description='The pagination cursor value, when'
+                                      + ' using cursor pagination.',
+                          type='string'),
+        ]
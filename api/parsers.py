@@ -0,0 +1,45 @@
+"""
+This module contains the custom Parsers needed for this app.
+"""
+
+import msgpack
+from django.conf import settings
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONParser(parsers.JSONParser):
+    """
+    JSONParser which decodes with orjson if it is installed, and falls back to
+    the standard library otherwise or if the request is not UTF-8 encoded.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('_', '-') != 'utf-8':
+            return super(FastJSONParser, self).parse(stream, media_type,
+                                                     parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+class MessagePackParser(parsers.BaseParser):
+    """
+    Parser for MessagePack request bodies. Timestamps are parsed to timezone
+    aware datetimes.
+    """
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False, timestamp=3)
+        except ValueError as exc:
+            raise ParseError('MessagePack parse error - %s' % str(exc))
@@ -4,6 +4,8 @@ This module declares the custom Permission classes.
 
 from rest_framework import permissions
 
+from .membership import get_context
+
 
 class PostPermission(permissions.BasePermission):
     """
@@ -17,7 +19,7 @@ class PostPermission(permissions.BasePermission):
             return True
 
         # Write permissions are only allowed to the club representative.
-        return obj.channel.club.has_rep(request.user)
+        return get_context(request.user).is_rep(obj.channel.club_id)
 
 
 class ConversationPermission(permissions.BasePermission):
@@ -29,7 +31,7 @@ class ConversationPermission(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         # Read permissions are allowed to only club members
         if request.method in permissions.SAFE_METHODS:
-            return obj.channel.club.has_member(request.user)
+            return get_context(request.user).is_member(obj.channel.club_id)
 
         # Write permissions are denied to everyone.
         return False
@@ -47,7 +49,7 @@ class ChannelPermission(permissions.BasePermission):
             return True
         # Only allow the Club rep to update
         if request.method == 'PUT':
-            return obj.club.has_rep(request.user)
+            return get_context(request.user).is_rep(obj.club_id)
         # No one is allowed to directly create or delete a Channel
         return False
 
@@ -62,11 +64,12 @@ class ClubPermission(permissions.BasePermission):
         # Read permissions are allowed to everyone
         if request.method in permissions.SAFE_METHODS:
             return True
+        context = get_context(request.user)
         # Only allow a secretary to delete
         if request.method == 'DELETE':
-            return request.user.is_secretary
+            return context.is_secretary
         # Only allow a secretary or club representative to update
-        return request.user.is_secretary or obj.has_rep(request.user)
+        return context.is_secretary or context.is_rep(obj.id)
 
 
 class ClubRolePermission(permissions.BasePermission):
@@ -76,12 +79,13 @@ class ClubRolePermission(permissions.BasePermission):
     """
 
     def has_object_permission(self, request, view, obj):
+        context = get_context(request.user)
         if request.method in permissions.SAFE_METHODS:
             # Only allow the club members to view
-            return obj.club.has_member(request.user)
+            return context.is_member(obj.club_id)
 
         # Only allow the club representative to edit
-        return obj.club.has_rep(request.user)
+        return context.is_rep(obj.club_id)
 
 
 class ClubMembershipPermission(permissions.BasePermission):
@@ -98,18 +102,19 @@ class ClubMembershipPermission(permissions.BasePermission):
         have to go through the ClubMembershipRequest route.
         """
         if request.method == 'POST':
-            return request.user.is_secretary
+            return get_context(request.user).is_secretary
         return True
 
     def has_object_permission(self, request, view, obj):
-        if request.user.is_secretary:
+        context = get_context(request.user)
+        if context.is_secretary:
             return True
 
         if request.method in permissions.SAFE_METHODS:
-            return obj.club_role.club.has_member(request.user)
+            return context.is_member(obj.club_role.club_id)
 
         # Only allow the club representative or a secretary to edit
-        return obj.club_role.club.has_rep(request.user)
+        return context.is_rep(obj.club_role.club_id)
 
 
 class FeedbackPermission(permissions.BasePermission):
@@ -120,9 +125,10 @@ class FeedbackPermission(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
-            return obj.author == request.user \
-                   or request.user.is_secretary \
-                   or obj.club.has_rep(request.user)
+            context = get_context(request.user)
+            return obj.author_id == request.user.id \
+                   or context.is_secretary \
+                   or context.is_rep(obj.club_id)
         # Do not allow write permissions to anyone
         return False
 
@@ -135,9 +141,10 @@ class FeedbackReplyPermission(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
-            return obj.parent.author == request.user \
-                   or request.user.is_secretary \
-                   or obj.parent.club.has_rep(request.user)
+            context = get_context(request.user)
+            return obj.parent.author_id == request.user.id \
+                   or context.is_secretary \
+                   or context.is_rep(obj.parent.club_id)
 
         # Do not allow anyone to modify or delete
         return False
@@ -151,14 +158,15 @@ class ProjectPermission(permissions.BasePermission):
     """
 
     def has_object_permission(self, request, view, obj):
+        context = get_context(request.user)
         if request.method in permissions.SAFE_METHODS:
-            return request.user.is_secretary or \
-                   obj.has_club_member(request.user)
+            return context.is_secretary or \
+                   context.is_member_of_any(obj.get_club_ids())
         # Do not allow anyone to delete a Project.
         if request.method == 'DELETE':
             return False
         # Allow write permissions to only the owner club representative
-        return obj.owner_club.has_rep(request.user)
+        return context.is_rep(obj.owner_club_id)
 
 
 class ProjectMembershipPermission(permissions.BasePermission):
@@ -169,14 +177,15 @@ class ProjectMembershipPermission(permissions.BasePermission):
     """
 
     def has_object_permission(self, request, view, obj):
+        context = get_context(request.user)
         if request.method in permissions.SAFE_METHODS:
             # Only allow the members of parent clubs to view details.
-            return obj.project.has_club_member(request.user)
+            return context.is_member_of_any(obj.project.get_club_ids())
 
         if request.method == 'DELETE':
             # Only allow the leader and rep of the club to delete.
-            return obj.project.has_leader(request.user) or \
-                   obj.club.has_rep(request.user)
+            return obj.project.leader_id == request.user.id or \
+                   context.is_rep(obj.club_id)
 
         # Do not allow anyone to edit
         return False
@@ -196,7 +205,7 @@ class ClubMembershipRequestPermission(permissions.BasePermission):
 
         # Only allow access to the requester or the representative of the club
         # for which the request is made
-        if obj.club.has_rep(request.user) or \
-                obj.user == request.user:
+        if get_context(request.user).is_rep(obj.club_id) or \
+                obj.user_id == request.user.id:
             return True
         return False
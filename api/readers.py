@@ -0,0 +1,142 @@
+"""
+This module contains the values readers, which build the representation of a
+read serializer directly from the rows returned by `QuerySet.values()`.
+
+Serializing a list with a ModelSerializer creates a model instance for every
+row and walks the field tree of the serializer for each of them. A
+ValuesReader resolves the fields of a serializer once, to the lookup that
+fetches their value and the function that represents it, and then applies
+those to plain rows. The result is the same as the `data` of the serializer.
+
+Only fields whose value does not depend on the instance or the request are
+supported. A serializer can provide the lookup and the function of any other
+field in `Meta.fast_fields`, a dict mapping the name of the field to a
+`(lookup, function)` tuple.
+"""
+
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import fields as rest_fields
+from rest_framework import relations
+
+
+def identity(value):
+    """
+    Returns `value` unchanged.
+    """
+    return value
+
+
+def choice_display(model, field_name):
+    """
+    Returns a function which returns the human readable value of a choice of
+    the field `field_name` of `model`, like `get_FOO_display()` does.
+    """
+    choices = dict(model._meta.get_field(field_name).flatchoices)
+
+    def display(value):
+        return choices.get(value, value)
+    return display
+
+
+class ValuesReader(object):
+    """
+    Reads the representation of the serializer `serializer_class` from the
+    rows of a queryset. Use `get_reader()` to share readers between requests.
+    """
+
+    def __init__(self, serializer_class, mappers=None):
+        self.serializer_class = serializer_class
+        if mappers is None:
+            mappers = self.compile(serializer_class)
+        self.mappers = mappers
+        self.lookups = tuple(
+            sorted(set(lookup for _, lookup, _ in self.mappers)))
+
+    def compile(self, serializer_class):
+        """
+        Returns the list of `(name, lookup, function)` tuples of the readable
+        fields of `serializer_class`.
+        """
+        fast_fields = getattr(serializer_class.Meta, 'fast_fields', {})
+        mappers = []
+        for name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if name in fast_fields:
+                lookup, function = fast_fields[name]
+            else:
+                lookup, function = self.compile_field(name, field)
+            mappers.append((name, lookup, function))
+        return mappers
+
+    def subset(self, names):
+        """
+        Returns a ValuesReader of only the fields in `names`.
+        """
+        return ValuesReader(self.serializer_class, [
+            mapper for mapper in self.mappers if mapper[0] in names])
+
+    def compile_field(self, name, field):
+        """
+        Returns the lookup and the function to represent the value of the
+        serializer field `field`.
+        """
+        lookup = '__'.join(field.source_attrs)
+        if isinstance(field, relations.PrimaryKeyRelatedField):
+            # The rows already contain the primary key of the related object
+            if field.pk_field is not None:
+                return lookup, field.pk_field.to_representation
+            return lookup, identity
+        if isinstance(field, rest_fields.ReadOnlyField):
+            return lookup, identity
+        if isinstance(field, (rest_fields.SerializerMethodField,
+                              relations.RelatedField,
+                              relations.ManyRelatedField,
+                              rest_fields.ListField,
+                              rest_fields.DictField)) or \
+                field.source == '*' or hasattr(field, 'fields'):
+            raise ImproperlyConfigured(
+                '{}.{} can not be read from values, declare it in'
+                ' Meta.fast_fields.'.format(self.serializer_class.__name__,
+                                            name))
+        return lookup, field.to_representation
+
+    def read(self, queryset, extra=()):
+        """
+        Returns a queryset of the rows of `queryset` needed by this reader,
+        which also contain the `extra` lookups.
+        """
+        lookups = self.lookups + tuple(
+            lookup for lookup in extra if lookup not in self.lookups)
+        return queryset.prefetch_related(None).values(*lookups)
+
+    def represent(self, rows):
+        """
+        Returns the list of representations of `rows` read by `read()`.
+        """
+        mappers = self.mappers
+        return [
+            {name: None if row[lookup] is None else function(row[lookup])
+             for name, lookup, function in mappers}
+            for row in rows
+        ]
+
+
+_readers = {}
+_readers_lock = threading.Lock()
+
+
+def get_reader(serializer_class):
+    """
+    Returns the ValuesReader of `serializer_class`, compiling it on first use.
+    """
+    reader = _readers.get(serializer_class)
+    if reader is None:
+        with _readers_lock:
+            reader = _readers.get(serializer_class)
+            if reader is None:
+                reader = _readers[serializer_class] = ValuesReader(
+                    serializer_class)
+    return reader
@@ -0,0 +1,59 @@
+"""
+This module contains the custom Renderers needed for this app.
+"""
+
+import msgpack
+from rest_framework import renderers
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """
+    JSONRenderer which encodes with orjson if it is installed, and falls back
+    to the standard library otherwise or if indented output is requested.
+
+    Types that orjson does not support natively, such as Decimal and lazy
+    translations, are converted by the encoder of REST framework.
+    """
+    orjson_options = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) \
+        if orjson is not None else 0
+    orjson_default = encoders.JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type or '',
+                                 renderer_context or {})
+        if orjson is None or indent or self.ensure_ascii or not self.compact:
+            return super(FastJSONRenderer, self).render(
+                data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=self.orjson_default,
+                           option=self.orjson_options)
+        # U+2028 and U+2029 are valid in JSON but not in JavaScript, so escape
+        # them like JSONRenderer does.
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028') \
+            .replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    """
+    Renderer which serializes to MessagePack. Timezone aware datetimes are
+    packed with the compact timestamp extension type, other types unknown to
+    MessagePack are converted like in JSON.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+    default = encoders.JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=self.default, datetime=True)
@@ -0,0 +1,119 @@
+"""
+This module contains the precomputed OpenAPI schema of the API.
+
+Generating the schema walks every ViewSet, serializer and filter backend, so
+it is generated once per process and code version instead of on every
+request, and served with a strong ETag made of that version.
+"""
+
+import hashlib
+import importlib
+import os
+import threading
+
+import drf_yasg
+import rest_framework
+from django.apps import apps
+from django.conf import settings
+from django.utils.cache import get_conditional_response
+from drf_yasg import renderers
+from drf_yasg.views import get_schema_view
+from rest_framework.response import Response
+
+# Renderers of the schema itself, whose output only depends on the schema.
+SPEC_RENDERERS = (renderers.OpenAPIRenderer, renderers.SwaggerJSONRenderer,
+                  renderers.SwaggerYAMLRenderer)
+
+_code_version = None
+_schemas = {}
+_lock = threading.Lock()
+
+
+def get_code_version():
+    """
+    Returns a hash of the source code of the apps of this project and of the
+    versions of Django REST framework and drf-yasg, which changes whenever
+    the schema may change.
+    """
+    global _code_version
+    if _code_version is None:
+        paths = [app.path for app in apps.get_app_configs()
+                 if app.path.startswith(settings.BASE_DIR)]
+        settings_module = importlib.import_module(settings.SETTINGS_MODULE)
+        paths.append(os.path.dirname(os.path.abspath(
+            settings_module.__file__)))
+        digest = hashlib.sha1('{}|{}'.format(
+            rest_framework.VERSION, drf_yasg.__version__).encode('utf-8'))
+        for path in sorted(set(paths)):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith('.py'):
+                        with open(os.path.join(root, name), 'rb') as source:
+                            digest.update(name.encode('utf-8'))
+                            digest.update(source.read())
+        _code_version = digest.hexdigest()
+    return _code_version
+
+
+def build_schema(view_class):
+    """
+    Generates the schema of the schema view `view_class`, as done by the
+    schema views of drf-yasg for a request with no user and no URL.
+    """
+    generator = view_class.generator_class(view_class.schema_info)
+    return generator.get_schema(None, view_class.public)
+
+
+def get_schema(view_class):
+    """
+    Returns the schema of the schema view `view_class`, generating it the
+    first time it is asked for with the current code version.
+    """
+    key = (view_class, get_code_version())
+    schema = _schemas.get(key)
+    if schema is None:
+        with _lock:
+            schema = _schemas.get(key)
+            if schema is None:
+                schema = build_schema(view_class)
+                _schemas[key] = schema
+    return schema
+
+
+class PrecomputedSchemaMixin(object):
+    """
+    A mixin for the schema views returned by `get_schema_view()` of drf-yasg,
+    which serves the schema returned by `get_schema()` instead of generating
+    it on every request. Responses rendered with one of the `SPEC_RENDERERS`
+    carry a strong ETag, and requests whose `If-None-Match` matches it get 304
+    Not Modified.
+    """
+
+    def get(self, request, version='', format=None):
+        schema = get_schema(type(self))
+        if not isinstance(request.accepted_renderer, SPEC_RENDERERS):
+            return Response(schema)
+
+        etag = '"{}"'.format(hashlib.sha1('{}|{}'.format(
+            get_code_version(), request.accepted_renderer.format,
+        ).encode('utf-8')).hexdigest())
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+        response = Response(schema)
+        response['ETag'] = etag
+        return response
+
+
+def get_precomputed_schema_view(info, **kwargs):
+    """
+    Returns the schema view returned by `get_schema_view()` of drf-yasg for
+    `info` and `kwargs`, with PrecomputedSchemaMixin.
+    """
+    schema_view = get_schema_view(info, **kwargs)
+
+    class PrecomputedSchemaView(PrecomputedSchemaMixin, schema_view):
+        schema_info = info
+
+    return PrecomputedSchemaView
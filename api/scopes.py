@@ -0,0 +1,116 @@
+"""
+This module contains the subqueries used to scope querysets to the Clubs,
+Channels and Projects that a User is associated with.
+
+All of these match the User exactly on the indexed foreign key columns, so
+they can be used as `IN`/`Exists` subqueries without scanning every
+membership row. The `Exists` expressions are correlated to the outer query
+through the given reference, so that filtering on a multi-valued relation
+does not multiply the rows of the outer query.
+"""
+
+from django.db.models import Exists, OuterRef
+
+from . import constants, models
+
+
+def member_club_ids(user):
+    """
+    Returns a queryset of the ids of all Clubs that `user` is a member of.
+    """
+    return models.ClubMembership.objects.filter(
+        user__id=user.id,
+    ).values('club_role__club_id')
+
+
+def rep_club_ids(user):
+    """
+    Returns a queryset of the ids of all Clubs that `user` is a
+    representative of.
+    """
+    return models.ClubMembership.objects.filter(
+        user__id=user.id,
+        club_role__privilege=constants.PRIVILEGE_REP,
+    ).values('club_role__club_id')
+
+
+def subscribed_channel_ids(user):
+    """
+    Returns a queryset of the ids of all Channels that `user` has subscribed
+    to.
+    """
+    return models.ChannelSubscription.objects.filter(
+        user__id=user.id,
+    ).values('channel_id')
+
+
+def timeline_post_ids(user):
+    """
+    Returns a queryset of the ids of all Posts in the timeline of `user`.
+    """
+    return models.TimelineEntry.objects.filter(
+        user__id=user.id,
+    ).values('post_id')
+
+
+def fanout_on_read_channel_ids(user):
+    """
+    Returns a queryset of the ids of all Channels subscribed by `user` whose
+    Posts are read on demand instead of being written to the timeline.
+    """
+    return models.ChannelSubscription.objects.filter(
+        user__id=user.id,
+        channel__fanout_on_read=True,
+    ).values('channel_id')
+
+
+def is_member_of_club(user, club_ref):
+    """
+    Returns an Exists expression which is true if `user` is a member of the
+    Club referenced by `club_ref` in the outer query.
+    """
+    return Exists(models.ClubMembership.objects.filter(
+        user__id=user.id,
+        club_role__club_id=OuterRef(club_ref),
+    ))
+
+
+def is_rep_of_club(user, club_ref):
+    """
+    Returns an Exists expression which is true if `user` is a representative
+    of the Club referenced by `club_ref` in the outer query.
+    """
+    return Exists(models.ClubMembership.objects.filter(
+        user__id=user.id,
+        club_role__club_id=OuterRef(club_ref),
+        club_role__privilege=constants.PRIVILEGE_REP,
+    ))
+
+
+def member_project_ids(user):
+    """
+    Returns a queryset of the ids of all Projects that a Club which `user` is
+    a member of collaborates on.
+    """
+    return models.ClubProject.objects.filter(
+        club__id__in=member_club_ids(user),
+    ).values('project_id')
+
+
+def club_project_ids(club_id):
+    """
+    Returns a queryset of the ids of all Projects that the Club with id
+    `club_id` collaborates on.
+    """
+    return models.ClubProject.objects.filter(
+        club__id=club_id,
+    ).values('project_id')
+
+
+def user_project_ids(user):
+    """
+    Returns a queryset of the ids of all Projects that `user` is a member of.
+    """
+    return models.ProjectMembership.objects.filter(
+        user__id=user.id,
+    ).values('project_id')
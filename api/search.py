@@ -0,0 +1,142 @@
+"""
+This module contains the full-text search backends used to search the content
+of Posts and Conversations.
+
+Every backend provides `search(queryset, field, terms, ranked)` which returns
+`queryset` restricted to the objects whose `field` matches all of `terms`,
+annotated with a `search_rank` if `ranked` is True. The full-text indexes
+used by the backends are created by migration 0005.
+
+The full-text backends match every term as the prefix of a word, so "foot"
+matches "football" but "ball" does not, unlike LikeSearchBackend which
+matches any substring.
+"""
+
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+# Characters with a special meaning in full-text query syntaxes.
+_SPECIAL_CHARS = re.compile(r'[^\w]+', re.UNICODE)
+
+
+def get_terms(query):
+    """
+    Returns the list of plain terms in the search `query`.
+    """
+    return [term for term in _SPECIAL_CHARS.split(query) if term]
+
+
+class LikeSearchBackend(object):
+    """
+    Fallback backend for databases without full-text support. Scans the whole
+    table with `LIKE` and does not rank the results.
+    """
+
+    def search(self, queryset, field, terms, ranked):
+        condition = Q()
+        for term in terms:
+            condition &= Q(**{field + '__icontains': term})
+        queryset = queryset.filter(condition)
+        if ranked:
+            queryset = queryset.annotate(
+                search_rank=Value(0, output_field=FloatField()))
+        return queryset
+
+
+class MySQLFullTextSearchBackend(object):
+    """
+    Backend using the InnoDB FULLTEXT index on the searched column. Every term
+    is required and matched as a prefix so that partial words match while
+    typing.
+
+    InnoDB does not index stopwords and words shorter than
+    `innodb_ft_min_token_size`, so a required prefix made of one of them
+    would only match longer words. These terms are left out of the search,
+    and if no term is left, the search falls back to LikeSearchBackend. The
+    defaults of InnoDB are assumed.
+    """
+    min_token_size = 3
+    stopwords = frozenset([
+        'a', 'about', 'an', 'are', 'as', 'at', 'be', 'by', 'com', 'de', 'en',
+        'for', 'from', 'how', 'i', 'in', 'is', 'it', 'la', 'of', 'on', 'or',
+        'that', 'the', 'this', 'to', 'was', 'what', 'when', 'where', 'who',
+        'will', 'with', 'und', 'www',
+    ])
+
+    def get_indexed_terms(self, terms):
+        """
+        Returns the terms of `terms` that InnoDB indexes words for.
+        """
+        return [term for term in terms if len(term) >= self.min_token_size
+                and term.lower() not in self.stopwords]
+
+    def search(self, queryset, field, terms, ranked):
+        indexed_terms = self.get_indexed_terms(terms)
+        if not indexed_terms:
+            return LikeSearchBackend().search(queryset, field, terms, ranked)
+        quote_name = connection.ops.quote_name
+        match = 'MATCH ({}.{}) AGAINST (%s IN BOOLEAN MODE)'.format(
+            quote_name(queryset.model._meta.db_table),
+            quote_name(queryset.model._meta.get_field(field).column),
+        )
+        query = ' '.join('+{}*'.format(term) for term in indexed_terms)
+        queryset = queryset.annotate(
+            search_rank=RawSQL(match, (query,), output_field=FloatField()),
+        ).filter(search_rank__gt=0)
+        return queryset
+
+
+class SQLiteFTS5SearchBackend(object):
+    """
+    Backend using an FTS5 shadow table named `<table>_fts`, kept up to date
+    by triggers on the searched table. Every term is required and matched as
+    a prefix. The shadow table is joined once, so that its MATCH and the
+    bm25() rank of each row are only computed once.
+    """
+
+    def search(self, queryset, field, terms, ranked):
+        quote_name = connection.ops.quote_name
+        table = queryset.model._meta.db_table
+        fts_table = table + '_fts'
+        query = ' '.join(
+            '"{}"*'.format(term.replace('"', '""')) for term in terms)
+        queryset = queryset.extra(
+            tables=[fts_table],
+            where=[
+                '{fts} MATCH %s'.format(fts=quote_name(fts_table)),
+                '{fts}.rowid = {table}.{pk}'.format(
+                    fts=quote_name(fts_table),
+                    table=quote_name(table),
+                    pk=quote_name(queryset.model._meta.pk.column),
+                ),
+            ],
+            params=[query],
+        )
+        if ranked:
+            # bm25() is lower for better matches, so negate it to rank the
+            # same way as the other backends.
+            queryset = queryset.extra(select={
+                'search_rank': '-bm25({})'.format(quote_name(fts_table)),
+            })
+        return queryset
+
+
+_VENDOR_BACKENDS = {
+    'mysql': MySQLFullTextSearchBackend,
+    'sqlite': SQLiteFTS5SearchBackend,
+}
+
+
+def get_backend():
+    """
+    Returns the search backend configured by the `SEARCH_BACKEND` setting, or
+    the one for the database in use if it is not set.
+    """
+    if settings.SEARCH_BACKEND:
+        return import_string(settings.SEARCH_BACKEND)()
+    return _VENDOR_BACKENDS.get(connection.vendor, LikeSearchBackend)()
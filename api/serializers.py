@@ -7,8 +7,8 @@ from django.contrib.auth import get_user_model
 from rest_auth.serializers import PasswordResetSerializer
 from rest_framework import serializers
 
-from . import constants
-from . import models
+from . import models, readers
+from .membership import get_context
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -39,12 +39,7 @@ class ClubSerializer(serializers.ModelSerializer):
         """
         Method to get the privilege of current user for this Club.
         """
-        user = self.context['request'].user
-        if obj.has_rep(user):
-            return constants.PRIVILEGE_REP
-        if obj.has_member(user):
-            return constants.PRIVILEGE_MEM
-        return None
+        return get_context(self.context['request'].user).get_privilege(obj.id)
 
 
 class ClubMembershipRequestSerializer(serializers.ModelSerializer):
@@ -59,6 +54,7 @@ class ClubMembershipRequestSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.ClubMembershipRequest
         fields = ('id', 'user', 'club', 'initiated', 'status', 'closed')
+        expandable = {'user': 'user', 'club': 'club'}
 
     def get_status(self, obj):
         """
@@ -75,6 +71,7 @@ class ClubRoleSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.ClubRole
         fields = ('id', 'name', 'description', 'club', 'privilege')
+        expandable = {'club': 'club'}
 
 
 class ClubMembershipSerializer(serializers.ModelSerializer):
@@ -90,6 +87,12 @@ class ClubMembershipSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.ClubMembership
         fields = ('id', 'user', 'username', 'club', 'joined', 'privilege')
+        expandable = {'user': 'user', 'club': 'club'}
+        fast_fields = {
+            'privilege': ('club_role__privilege',
+                          readers.choice_display(models.ClubRole,
+                                                 'privilege')),
+        }
 
     def get_privilege(self, obj):
         """
@@ -108,6 +111,7 @@ class ClubMembershipEditSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.ClubMembership
         fields = ('id', 'user', 'club_role', 'joined')
+        expandable = {'user': 'user', 'club_role': 'clubrole'}
 
 
 class ProjectSerializer(serializers.ModelSerializer):
@@ -121,6 +125,8 @@ class ProjectSerializer(serializers.ModelSerializer):
         model = models.Project
         fields = ('id', 'name', 'description', 'started', 'closed', 'leader',
                   'owner_club', 'members')
+        expandable = {'leader': 'user', 'owner_club': 'club',
+                      'members': 'user'}
 
     def validate(self, data):
         """
@@ -129,7 +135,13 @@ class ProjectSerializer(serializers.ModelSerializer):
         club = data['owner_club']
         leader = data['leader']
 
-        if not club.has_member(leader):
+        # Answer from the membership context of the current user if possible
+        request = self.context.get('request')
+        if request is not None and request.user.id == leader.id:
+            is_member = get_context(request.user).is_member(club.id)
+        else:
+            is_member = club.has_member(leader)
+        if not is_member:
             raise serializers.ValidationError(
                 'The specified leader must be a member of the owner club!'
             )
@@ -145,6 +157,7 @@ class ProjectMembershipSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.ProjectMembership
         fields = ('id', 'user', 'club', 'project', 'joined')
+        expandable = {'user': 'user', 'club': 'club', 'project': 'project'}
 
     def validate(self, data):
         """
@@ -176,15 +189,13 @@ class ChannelSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.Channel
         fields = ('id', 'name', 'subscribed', 'description', 'club')
+        expandable = {'club': 'club'}
 
     def get_subscribed(self, obj):
         """
         Method to get if the current user has subscribed to this Channel.
         """
-        user = self.context['request'].user
-        if obj.has_subscriber(user):
-            return True
-        return False
+        return get_context(self.context['request'].user).is_subscribed(obj.id)
 
 
 class PostSerializer(serializers.ModelSerializer):
@@ -196,6 +207,7 @@ class PostSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.Post
         fields = ('id', 'content', 'created', 'channel')
+        expandable = {'channel': 'channel'}
 
 
 class ConversationSerializer(serializers.ModelSerializer):
@@ -208,6 +220,8 @@ class ConversationSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.Conversation
         fields = ('id', 'content', 'created', 'channel', 'author', 'parent')
+        expandable = {'channel': 'channel', 'author': ('user', 'username'),
+                      'parent': 'conversation'}
 
 
 class FeedbackSerializer(serializers.ModelSerializer):
@@ -222,6 +236,8 @@ class FeedbackSerializer(serializers.ModelSerializer):
         model = models.Feedback
         fields = ('id', 'content', 'created', 'club',
                   'author', 'feedbackreply')
+        expandable = {'club': 'club', 'author': 'user',
+                      'feedbackreply': 'feedbackreply'}
 
 
 class FeedbackReplySerializer(serializers.ModelSerializer):
@@ -233,6 +249,7 @@ class FeedbackReplySerializer(serializers.ModelSerializer):
     class Meta:
         model = models.FeedbackReply
         fields = ('id', 'content', 'created', 'parent')
+        expandable = {'parent': 'feedback'}
 
 
 class CustomPasswordResetSerializer(PasswordResetSerializer):
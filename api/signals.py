@@ -0,0 +1,161 @@
+"""
+This module contains the receivers for the model signals of this app.
+"""
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from . import authentication, generations, membership, models, tokens
+
+
+@receiver(post_save, sender=models.ClubMembership)
+@receiver(post_delete, sender=models.ClubMembership)
+@receiver(post_save, sender=models.ChannelSubscription)
+@receiver(post_delete, sender=models.ChannelSubscription)
+def invalidate_membership_context(sender, instance, **kwargs):
+    """
+    Invalidate the membership contexts of the User whose membership or
+    subscription has changed.
+    """
+    membership.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=models.ChannelSubscription)
+def fill_timeline(sender, instance, created, raw, **kwargs):
+    """
+    Add the Posts of the Channel to the timeline of a User who has just
+    subscribed to it, however the subscription was created. Subscriptions
+    created in bulk do not send this signal and must be filled in by their
+    creator.
+    """
+    if created and not raw:
+        instance.channel.add_to_timeline(instance.user_id)
+
+
+@receiver(post_delete, sender=models.ChannelSubscription)
+def prune_timeline(sender, instance, **kwargs):
+    """
+    Remove the Posts of the Channel from the timeline of a User who has just
+    unsubscribed from it.
+    """
+    models.TimelineEntry.objects.filter(
+        user_id=instance.user_id,
+        channel_id=instance.channel_id,
+    ).delete()
+
+
+@receiver(post_delete, sender=models.ProjectMembership)
+def touch_project(sender, instance, **kwargs):
+    """
+    Mark the Project of a deleted ProjectMembership as updated, in the
+    transaction of the deletion, however the membership was deleted,
+    including in bulk by `Project.remove_collaborator()` and by cascade.
+    """
+    instance.touch_project()
+
+
+@receiver(post_save, sender=models.ClubRole)
+def invalidate_all_membership_contexts(sender, instance, **kwargs):
+    """
+    The privilege of a ClubRole may have changed, which affects all of its
+    members, so invalidate every membership context.
+    """
+    membership.invalidate()
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def evict_cached_token(sender, instance, **kwargs):
+    """
+    Evict a Token which has been changed or deleted, e.g. on logout, from
+    the cache of CachedTokenAuthentication.
+    """
+    authentication.evict_token(instance.key)
+
+
+@receiver(post_save, sender=models.User)
+def evict_cached_user_credentials(sender, instance, created, update_fields,
+                                  **kwargs):
+    """
+    Evict the Tokens and verified credentials of a User which has been
+    changed, e.g. its password or whether it is active, from the caches of
+    CachedTokenAuthentication and CachedBasicAuthentication. Saving only the
+    last login time, as done on every login, changes nothing that is checked.
+    """
+    if created or update_fields == frozenset(['last_login']):
+        return
+    authentication.evict_user_tokens(instance.id)
+    authentication.verified_credentials.discard_user(instance.id)
+
+
+@receiver(post_save, sender=models.ClubMembership)
+@receiver(post_delete, sender=models.ClubMembership)
+@receiver(post_save, sender=models.User)
+@receiver(post_delete, sender=models.User)
+def revoke_access_tokens(sender, instance, **kwargs):
+    """
+    Revoke the signed access tokens of the User whose privileges or account
+    have changed, or who has been deleted, by bumping the token version of
+    the User. Saving only the last login time of a User changes nothing
+    carried by the tokens.
+    """
+    if sender is models.User:
+        if kwargs.get('created') or \
+                kwargs.get('update_fields') == frozenset(['last_login']):
+            return
+        tokens.bump_versions([instance.id])
+    else:
+        tokens.bump_versions([instance.user_id])
+
+
+@receiver(post_save, sender=models.ClubRole)
+def revoke_role_access_tokens(sender, instance, created, **kwargs):
+    """
+    The privilege of a ClubRole may have changed, so revoke the signed access
+    tokens of all of its members.
+    """
+    if not created:
+        tokens.bump_versions(instance.clubmembership_set.values_list(
+            'user_id', flat=True))
+
+
+# Functions returning the ids of the Clubs whose visible data changes with an
+# instance of each model.
+_CLUB_IDS = {
+    models.Club: lambda instance: [instance.id, generations.CLUB_DIRECTORY],
+    models.ClubRole: lambda instance: [instance.club_id],
+    models.ClubMembership: lambda instance: [instance.club_role.club_id],
+    models.ClubMembershipRequest: lambda instance: [instance.club_id],
+    models.Channel: lambda instance: [instance.club_id],
+    models.ChannelSubscription: lambda instance: [instance.channel.club_id],
+    models.Post: lambda instance: [instance.channel.club_id],
+    models.Conversation: lambda instance: [instance.channel.club_id],
+    models.Feedback: lambda instance: [instance.club_id],
+    models.FeedbackReply: lambda instance: [instance.parent.club_id],
+    models.Project: lambda instance: instance.get_club_ids(),
+    models.ClubProject: lambda instance: [instance.club_id],
+    models.ProjectMembership: lambda instance: instance.project.get_club_ids(),
+}
+
+
+def bump_club_generations(sender, instance, **kwargs):
+    """
+    Bump the generations of the Clubs whose visible data has changed with
+    `instance`.
+    """
+    try:
+        club_ids = _CLUB_IDS[sender](instance)
+    except ObjectDoesNotExist:
+        # The related object is being deleted along with its Club, whose
+        # generation is bumped on its own.
+        return
+    generations.bump(club_ids)
+
+
+for model in _CLUB_IDS:
+    post_save.connect(bump_club_generations, sender=model,
+                      dispatch_uid='bump_club_generations_save')
+    post_delete.connect(bump_club_generations, sender=model,
+                        dispatch_uid='bump_club_generations_delete')
@@ -1 +1,1087 @@
-# Create your tests here.
+"""
+Tests for the api app.
+"""
+
+import datetime
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import (SimpleTestCase, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from . import (authentication, checks, constants, filters, generations,
+               membership, models, schema, scopes, search)
+from .management.commands import benchmark_api, explain_filters
+from .urls import router
+
+
+def get_request(user, **params):
+    """
+    Returns a GET Request with the query `params` made by `user`.
+    """
+    request = Request(APIRequestFactory().get('/', params))
+    request.user = user
+    return request
+
+
+def filter_ids(filter_class, user, queryset, **params):
+    """
+    Returns the set of ids of the objects of `queryset` that `filter_class`
+    lets `user` see.
+    """
+    return set(filter_class().filter_queryset(
+        get_request(user, **params), queryset, None).values_list('id',
+                                                                  flat=True))
+
+
+class ReferenceScopes(object):
+    """
+    Exact-match reference implementation of the scopes, which loads every
+    row and compares the ids in Python.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    def member_club_ids(self):
+        return {membership.club_role.club_id for membership
+                in models.ClubMembership.objects.select_related('club_role')
+                if membership.user_id == self.user.id}
+
+    def rep_club_ids(self):
+        return {membership.club_role.club_id for membership
+                in models.ClubMembership.objects.select_related('club_role')
+                if membership.user_id == self.user.id
+                and membership.club_role.privilege == constants.PRIVILEGE_REP}
+
+    def subscribed_channel_ids(self):
+        return {subscription.channel_id for subscription
+                in models.ChannelSubscription.objects.all()
+                if subscription.user_id == self.user.id}
+
+    def project_ids(self):
+        member_club_ids = self.member_club_ids()
+        return {club_project.project_id for club_project
+                in models.ClubProject.objects.all()
+                if club_project.club_id in member_club_ids}
+
+    def visible_request_ids(self):
+        rep_club_ids = self.rep_club_ids()
+        return {request.id for request
+                in models.ClubMembershipRequest.objects.all()
+                if request.club_id in rep_club_ids
+                or request.user_id == self.user.id}
+
+    def visible_feedback_ids(self):
+        rep_club_ids = self.rep_club_ids()
+        return {feedback.id for feedback in models.Feedback.objects.all()
+                if self.user.is_secretary or feedback.club_id in rep_club_ids
+                or feedback.author_id == self.user.id}
+
+    def visible_reply_ids(self):
+        visible_feedback_ids = self.visible_feedback_ids()
+        return {reply.id for reply in models.FeedbackReply.objects.all()
+                if reply.parent_id in visible_feedback_ids}
+
+    def visible_project_ids(self):
+        if self.user.is_secretary:
+            return set(models.Project.objects.values_list('id', flat=True))
+        return self.project_ids()
+
+    def visible_project_membership_ids(self):
+        project_ids = self.project_ids()
+        return {membership.id for membership
+                in models.ProjectMembership.objects.all()
+                if membership.project_id in project_ids}
+
+    def visible_conversation_ids(self, include_replies=False):
+        member_club_ids = self.member_club_ids()
+        return {conversation.id for conversation
+                in models.Conversation.objects.select_related('channel')
+                if conversation.channel.club_id in member_club_ids
+                and (include_replies or conversation.parent_id is None)}
+
+    def visible_role_ids(self):
+        member_club_ids = self.member_club_ids()
+        return {role.id for role in models.ClubRole.objects.all()
+                if role.club_id in member_club_ids}
+
+
+class ScopeTestCase(TestCase):
+    """
+    Base class for tests needing a few Clubs with a secretary, a
+    representative, a plain member and an outsider, along with other Users
+    whose ids contain theirs, e.g. 11 and 12 for 1 and 2, so that matching
+    ids as strings would be noticed.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.secretary = User.objects.create_user('secretary',
+                                                 is_secretary=True)
+        cls.rep = User.objects.create_user('rep')
+        cls.member = User.objects.create_user('member')
+        cls.outsider = User.objects.create_user('outsider')
+        cls.users = {
+            'secretary': cls.secretary,
+            'rep': cls.rep,
+            'member': cls.member,
+            'outsider': cls.outsider,
+        }
+        cls.others = [User.objects.create_user('other_{}'.format(i))
+                      for i in range(20)]
+
+        cls.club_a = models.Club.objects.create(name='A', description='A')
+        cls.club_b = models.Club.objects.create(name='B', description='B')
+        cls.club_c = models.Club.objects.create(name='C', description='C')
+        cls.club_a.add_member(cls.rep, constants.PRIVILEGE_REP)
+        cls.club_b.add_member(cls.rep)
+        cls.club_a.add_member(cls.member)
+        cls.club_c.add_member(cls.secretary)
+        for i, other in enumerate(cls.others):
+            cls.club_c.add_member(other, constants.PRIVILEGE_REP if i % 2
+                                  else constants.PRIVILEGE_MEM)
+
+        cls.club_a.channel.subscribe(cls.rep)
+        cls.club_a.channel.subscribe(cls.member)
+        cls.club_b.channel.subscribe(cls.member)
+        for other in cls.others:
+            cls.club_c.channel.subscribe(other)
+
+        for user, club in ((cls.outsider, cls.club_a),
+                           (cls.member, cls.club_b),
+                           (cls.others[0], cls.club_c)):
+            models.ClubMembershipRequest.objects.create(user=user, club=club)
+            feedback = models.Feedback.objects.create(
+                content='Feedback', club=club, author=user)
+            models.FeedbackReply.objects.create(content='Reply',
+                                                parent=feedback)
+
+        cls.project_a = models.Project.objects.create(
+            name='A', description='A', owner_club=cls.club_a,
+            leader=cls.rep)
+        cls.project_a.add_collaborator(cls.club_a)
+        cls.project_a.add_collaborator(cls.club_b)
+        cls.project_c = models.Project.objects.create(
+            name='C', description='C', owner_club=cls.club_c,
+            leader=cls.others[1])
+        cls.project_c.add_collaborator(cls.club_c)
+        models.ProjectMembership.objects.create(
+            user=cls.member, club=cls.club_a, project=cls.project_a)
+        models.ProjectMembership.objects.create(
+            user=cls.rep, club=cls.club_b, project=cls.project_a)
+        models.ProjectMembership.objects.create(
+            user=cls.others[1], club=cls.club_c, project=cls.project_c)
+
+        for club, author in ((cls.club_a, cls.member),
+                             (cls.club_b, cls.rep),
+                             (cls.club_c, cls.others[1])):
+            conversation = models.Conversation.objects.create(
+                content='Conversation', channel=club.channel, author=author)
+            models.Conversation.objects.create(
+                content='Reply', channel=club.channel, author=author,
+                parent=conversation)
+
+
+class ScopesTests(ScopeTestCase):
+    """
+    Tests that the scopes and the filters using them match the exact-match
+    reference implementation.
+    """
+
+    def test_club_ids(self):
+        for archetype, user in self.users.items():
+            with self.subTest(archetype):
+                reference = ReferenceScopes(user)
+                self.assertEqual(
+                    set(scopes.member_club_ids(user).values_list(
+                        'club_role__club_id', flat=True)),
+                    reference.member_club_ids())
+                self.assertEqual(
+                    set(scopes.rep_club_ids(user).values_list(
+                        'club_role__club_id', flat=True)),
+                    reference.rep_club_ids())
+
+    def test_subscribed_channel_ids(self):
+        for archetype, user in self.users.items():
+            with self.subTest(archetype):
+                self.assertEqual(
+                    set(scopes.subscribed_channel_ids(user).values_list(
+                        'channel_id', flat=True)),
+                    ReferenceScopes(user).subscribed_channel_ids())
+
+    def test_visible_querysets(self):
+        for archetype, user in self.users.items():
+            reference = ReferenceScopes(user)
+            cases = [
+                (filters.ClubMembershipRequestFilter,
+                 models.ClubMembershipRequest, {},
+                 reference.visible_request_ids()),
+                (filters.FeedbackFilter, models.Feedback, {},
+                 reference.visible_feedback_ids()),
+                (filters.FeedbackReplyFilter, models.FeedbackReply, {},
+                 reference.visible_reply_ids()),
+                (filters.ProjectFilter, models.Project, {},
+                 reference.visible_project_ids()),
+                (filters.ProjectMembershipFilter, models.ProjectMembership,
+                 {}, reference.visible_project_membership_ids()),
+                (filters.ConversationFilter, models.Conversation, {},
+                 reference.visible_conversation_ids()),
+                (filters.ConversationFilter, models.Conversation,
+                 {'replies': 1},
+                 reference.visible_conversation_ids(include_replies=True)),
+                (filters.ClubRoleFilter, models.ClubRole, {},
+                 reference.visible_role_ids()),
+                (filters.ClubFilter, models.Club, {'only_my': 1},
+                 reference.member_club_ids()),
+                (filters.ChannelFilter, models.Channel, {'only_my': 1},
+                 reference.subscribed_channel_ids()),
+            ]
+            for filter_class, model, params, expected in cases:
+                with self.subTest(archetype, filter=filter_class.__name__,
+                                  **params):
+                    self.assertEqual(
+                        filter_ids(filter_class, user, model.objects.all(),
+                                   **params),
+                        expected)
+
+    def test_lookalike_ids(self):
+        # The fixture is only meaningful if ids of other users contain the
+        # ids of the archetypes.
+        other_ids = [str(other.id) for other in self.others]
+        for archetype, user in self.users.items():
+            with self.subTest(archetype):
+                self.assertTrue(any(str(user.id) in other_id
+                                    for other_id in other_ids))
+
+
+class MembershipContextTests(ScopeTestCase):
+    """
+    Tests that the membership context of a User is invalidated as soon as
+    its memberships change, including in the request changing them.
+    """
+
+    def test_accept(self):
+        # The User of a request whose context has been used before accepting
+        outsider = get_user_model().objects.get(pk=self.outsider.pk)
+        context = membership.get_context(outsider)
+        self.assertFalse(context.is_member(self.club_a.id))
+        self.assertFalse(context.is_subscribed(self.club_a.channel.id))
+
+        models.ClubMembershipRequest.objects.get(
+            user=self.outsider, club=self.club_a).accept()
+        self.assertIs(membership.get_context(outsider), context)
+        self.assertEqual(context.get_privilege(self.club_a.id),
+                         constants.PRIVILEGE_MEM)
+
+    def test_invalidated_after_loading(self):
+        class RacingContext(membership.MembershipContext):
+            def __setattr__(self, name, value):
+                super(RacingContext, self).__setattr__(name, value)
+                # Another request changes the memberships of the User right
+                # after they are loaded
+                if value is not None and name in ('_privileges',
+                                                  '_subscribed_channel_ids'):
+                    self.invalidate()
+
+        context = RacingContext(self.member)
+        self.assertEqual(context.privileges,
+                         {self.club_a.id: constants.PRIVILEGE_MEM})
+        self.assertEqual(context.subscribed_channel_ids,
+                         {self.club_a.channel.id, self.club_b.channel.id})
+
+
+class TimelineCursorPaginationTests(ScopeTestCase):
+    """
+    Tests that the cursor pagination neither skips nor repeats objects which
+    share their creation time.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.member)
+        created = timezone.now()
+        conversations = [models.Conversation.objects.create(
+            content='Tied {}'.format(i), channel=self.club_a.channel,
+            author=self.member) for i in range(5)]
+        models.Conversation.objects.filter(
+            id__in=[conversation.id for conversation in conversations],
+        ).update(created=created)
+        self.expected = list(models.Conversation.objects.filter(
+            channel__club=self.club_a,
+            parent__isnull=True,
+        ).order_by('-created', '-id').values_list('id', flat=True))
+
+    def get_pages(self, url, params=None):
+        pages = []
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data)
+            url, params = response.data['next'], None
+        return pages
+
+    def test_next_pages(self):
+        pages = self.get_pages(reverse('conversation-list'),
+                               {'pagination': 'cursor', 'limit': 2})
+        ids = [row['id'] for page in pages for row in page['results']]
+        self.assertEqual(ids, self.expected)
+
+    def test_previous_page(self):
+        pages = self.get_pages(reverse('conversation-list'),
+                               {'pagination': 'cursor', 'limit': 2})
+        response = self.client.get(pages[2]['previous'])
+        self.assertEqual(response.data['results'], pages[1]['results'])
+
+    def test_ascending_order(self):
+        pages = self.get_pages(reverse('conversation-list'),
+                               {'pagination': 'cursor', 'limit': 2,
+                                'order': 1})
+        ids = [row['id'] for page in pages for row in page['results']]
+        self.assertEqual(ids, self.expected[::-1])
+
+
+class HomeTimelineTests(ScopeTestCase):
+    """
+    Tests that the home timeline returns the Posts of the subscribed
+    Channels, whether they are written to the timeline or read on demand,
+    and that the timeline follows the subscriptions and the Posts.
+    """
+
+    def setUp(self):
+        # Read the Posts of the Channel of B on demand
+        channel = models.Channel.objects.get(club=self.club_b)
+        with override_settings(TIMELINE_FANOUT_MAX_SUBSCRIBERS=1):
+            channel.subscribe(self.rep)
+        channel.refresh_from_db()
+        self.assertTrue(channel.fanout_on_read)
+
+        channels = list(models.Channel.objects.filter(
+            club__in=(self.club_a, self.club_b, self.club_c),
+        ).order_by('club__name'))
+        self.posts = [models.Post.objects.create(
+            content='Post {}'.format(i), channel=channels[i % 3])
+            for i in range(9)]
+        # Give some Posts the same creation time
+        models.Post.objects.filter(
+            id__in=[post.id for post in self.posts[3:6]],
+        ).update(created=self.posts[3].created)
+        models.TimelineEntry.objects.filter(
+            post__in=self.posts[3:6],
+        ).update(created=self.posts[3].created)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.member)
+
+    def get_expected(self, user):
+        channel_ids = set(models.ChannelSubscription.objects.filter(
+            user=user).values_list('channel_id', flat=True))
+        return list(models.Post.objects.filter(
+            channel__in=channel_ids,
+        ).order_by('-created', '-id').values_list('id', flat=True))
+
+    def get_ids(self, params):
+        ids = []
+        url = reverse('post-list')
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row['id'] for row in response.data['results'])
+            url, params = response.data['next'], None
+        return ids
+
+    def test_merges_channels_read_on_demand(self):
+        expected = self.get_expected(self.member)
+        self.assertEqual(len(expected), 6)
+        response = self.client.get(reverse('post-list'), {'limit': 100})
+        self.assertEqual(response.data['count'], len(expected))
+        self.assertEqual([row['id'] for row in response.data['results']],
+                         expected)
+
+    def test_pages(self):
+        expected = self.get_expected(self.member)
+        self.assertEqual(self.get_ids({'limit': 2}), expected)
+        self.assertEqual(self.get_ids({'limit': 2, 'order': 1}),
+                         expected[::-1])
+        self.assertEqual(self.get_ids({'limit': 2, 'pagination': 'cursor'}),
+                         expected)
+        self.assertEqual(self.get_ids({'limit': 2, 'pagination': 'cursor',
+                                       'order': 1}),
+                         expected[::-1])
+
+    def test_sparse_fields(self):
+        response = self.client.get(reverse('post-list'),
+                                   {'fields': 'content', 'limit': 1})
+        self.assertEqual(list(response.data['results'][0]), ['content'])
+
+    def test_moved_post(self):
+        post = self.posts[0]
+        post.channel = models.Channel.objects.get(club=self.club_c)
+        post.save()
+        self.assertNotIn(post.id, self.get_ids({'limit': 100}))
+        self.assertEqual(
+            set(models.TimelineEntry.objects.filter(post=post).values_list(
+                'user_id', 'channel_id')),
+            {(other.id, post.channel.id) for other in self.others})
+
+    def test_subscriptions_outside_channel(self):
+        channel = models.Channel.objects.get(club=self.club_a)
+        subscription = models.ChannelSubscription.objects.create(
+            user=self.outsider, channel=channel)
+        self.assertEqual(
+            set(models.TimelineEntry.objects.filter(
+                user=self.outsider).values_list('post_id', flat=True)),
+            set(self.get_expected(self.outsider)))
+        subscription.delete()
+        self.assertFalse(models.TimelineEntry.objects.filter(
+            user=self.outsider).exists())
+
+
+class ConversationThreadTests(ScopeTestCase):
+    """
+    Tests of the thread of a Conversation with its nested replies.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.member)
+        channel = models.Channel.objects.get(club=self.club_a)
+
+        def reply(parent, content):
+            return models.Conversation.objects.create(
+                content=content, channel=channel, author=self.member,
+                parent=parent)
+
+        self.root = reply(None, 'Root')
+        self.first = reply(self.root, 'First')
+        self.second = reply(self.root, 'Second')
+        self.nested = reply(self.first, 'Nested')
+        self.deepest = reply(self.nested, 'Deepest')
+
+    def get_thread(self, params=None):
+        return self.client.get(reverse('conversation-thread',
+                                       kwargs={'pk': self.root.pk}), params)
+
+    def get_tree(self, node):
+        return (node['id'], node['depth'],
+                [self.get_tree(reply) for reply in node['replies']])
+
+    def test_thread(self):
+        response = self.get_thread()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_tree(response.data), (
+            self.root.id, 0, [
+                (self.first.id, 1, [
+                    (self.nested.id, 2, [(self.deepest.id, 3, [])]),
+                ]),
+                (self.second.id, 1, []),
+            ]))
+
+    def test_depth(self):
+        for depth, expected in (
+                (0, (self.root.id, 0, [])),
+                (1, (self.root.id, 0, [(self.first.id, 1, []),
+                                       (self.second.id, 1, [])])),
+                (2, (self.root.id, 0, [
+                    (self.first.id, 1, [(self.nested.id, 2, [])]),
+                    (self.second.id, 1, [])])),
+        ):
+            with self.subTest(depth=depth):
+                response = self.get_thread({'depth': depth})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(self.get_tree(response.data), expected)
+
+    def test_invalid_depth(self):
+        for depth in ('-1', '-5', 'deep'):
+            with self.subTest(depth=depth):
+                self.assertEqual(
+                    self.get_thread({'depth': depth}).status_code, 400)
+
+    def test_not_member(self):
+        self.client.force_authenticate(self.outsider)
+        self.assertEqual(self.get_thread().status_code, 404)
+
+
+class ProjectScopeTests(ScopeTestCase):
+    """
+    Tests that the Projects and their memberships are listed once, whatever
+    the number of Clubs of the User collaborating on them.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        # The representative is a member of both Clubs of Project A
+        self.client.force_authenticate(self.rep)
+
+    def get_ids(self, basename, params=None):
+        response = self.client.get(reverse(basename + '-list'), params)
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data['results']]
+
+    def test_projects(self):
+        self.assertEqual(self.get_ids('project'), [self.project_a.id])
+        self.assertEqual(self.get_ids('project', {'club_id': self.club_b.id}),
+                         [self.project_a.id])
+        self.assertEqual(self.get_ids('project', {'club_id': self.club_c.id}),
+                         [])
+        self.assertEqual(self.get_ids('project', {'only_my': 1}),
+                         [self.project_a.id])
+
+    def test_project_members(self):
+        expected = list(models.ProjectMembership.objects.filter(
+            project=self.project_a).values_list('id', flat=True))
+        self.assertEqual(sorted(self.get_ids('projectmembership')),
+                         sorted(expected))
+        self.assertEqual(
+            sorted(self.get_ids('projectmembership',
+                                {'club_id': self.club_a.id})),
+            sorted(expected))
+
+
+class ConditionalGetTests(ScopeTestCase):
+    """
+    Tests of the ETags of the Projects and of the 304 responses to the
+    requests matching them.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.paths = [
+            reverse('project-list'),
+            reverse('project-detail', kwargs={'pk': self.project_a.pk}),
+        ]
+
+    def get(self, path, etag=None):
+        # A fresh User, as authenticated for every request
+        self.client.force_authenticate(
+            get_user_model().objects.get(pk=self.rep.pk))
+        if etag is None:
+            return self.client.get(path)
+        return self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+
+    def get_etags(self):
+        etags = []
+        for path in self.paths:
+            response = self.get(path)
+            self.assertEqual(response.status_code, 200)
+            etags.append(response['ETag'])
+        return etags
+
+    def assert_changed(self, etags):
+        """
+        Asserts that the ETags of the paths differ from `etags`, and that the
+        old ones are not answered with 304 any more.
+        """
+        for path, etag, new_etag in zip(self.paths, etags, self.get_etags()):
+            with self.subTest(path):
+                self.assertNotEqual(new_etag, etag)
+                self.assertEqual(self.get(path, etag).status_code, 200)
+
+    def test_not_modified(self):
+        for path, etag in zip(self.paths, self.get_etags()):
+            with self.subTest(path):
+                response = self.get(path, etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+
+    def test_membership_added_and_deleted(self):
+        etags = self.get_etags()
+        membership = models.ProjectMembership.objects.create(
+            user=self.others[0], club=self.club_a, project=self.project_a)
+        self.assert_changed(etags)
+
+        etags = self.get_etags()
+        membership.delete()
+        self.assert_changed(etags)
+
+    def test_privilege_changed(self):
+        etags = self.get_etags()
+        membership = models.ClubMembership.objects.get(
+            user=self.rep, club_role__club=self.club_a)
+        membership.club_role = models.ClubRole.objects.get(
+            club=self.club_a, privilege=constants.PRIVILEGE_MEM)
+        membership.save()
+        self.assert_changed(etags)
+
+
+class ExpandTests(ScopeTestCase):
+    """
+    Tests that only the related objects which the User may retrieve are
+    expanded.
+    """
+
+    def get_membership(self, user, club):
+        membership = models.ClubMembership.objects.get(
+            user=user, club_role__club=club)
+        response = self.client.get(
+            reverse('clubmembership-detail', kwargs={'pk': membership.pk}),
+            {'expand': 'club_role,user'})
+        self.assertEqual(response.status_code, 200)
+        return membership, response.data
+
+    def test_object_permissions(self):
+        self.client = APIClient()
+        # The secretary may retrieve every ClubMembership, but only the
+        # ClubRoles of Club C
+        self.client.force_authenticate(self.secretary)
+        membership, data = self.get_membership(self.secretary, self.club_c)
+        self.assertEqual(data['club_role']['id'], membership.club_role_id)
+        self.assertEqual(data['user']['id'], self.secretary.id)
+
+        membership, data = self.get_membership(self.member, self.club_a)
+        self.assertEqual(data['club_role'], membership.club_role_id)
+        self.assertEqual(data['user']['id'], self.member.id)
+
+
+class ProjectUpdatedTests(ScopeTestCase):
+    """
+    Tests that a Project is marked as updated whenever one of its
+    memberships is deleted.
+    """
+
+    def setUp(self):
+        self.past = timezone.now() - datetime.timedelta(days=1)
+        models.Project.objects.filter(pk=self.project_a.pk).update(
+            updated=self.past)
+
+    def assert_touched(self):
+        self.assertGreater(
+            models.Project.objects.get(pk=self.project_a.pk).updated,
+            self.past)
+
+    def test_delete(self):
+        models.ProjectMembership.objects.get(
+            project=self.project_a, user=self.member).delete()
+        self.assert_touched()
+
+    def test_remove_collaborator(self):
+        models.Project.objects.get(pk=self.project_a.pk).remove_collaborator(
+            self.club_b)
+        self.assertFalse(models.ProjectMembership.objects.filter(
+            project=self.project_a, club=self.club_b).exists())
+        self.assert_touched()
+
+    def test_cascade(self):
+        get_user_model().objects.get(pk=self.member.pk).delete()
+        self.assert_touched()
+
+
+@skipUnless(connection.vendor in ('mysql', 'sqlite'),
+            'Query plans of this database are not checked.')
+class QueryPlanTests(TestCase):
+    """
+    Tests that the default queries of the filter backends use indexes for
+    their filters and their ordering on a seeded database, as checked by the
+    `explain_filters` command.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('seed_perf_data', users=200, clubs=10, posts=500,
+                     conversations=300, projects=20, feedbacks=100,
+                     requests=100, stdout=StringIO())
+
+    def test_query_plans(self):
+        command = explain_filters.Command()
+        users = command.get_users([])
+        users.append(get_user_model().objects.filter(
+            clubmembership__isnull=True).first())
+        for user in users:
+            with self.subTest(user.username):
+                self.assertEqual(command.find_problems(user), [])
+
+
+class QueryScalingTests(TestCase):
+    """
+    Tests that the list routes run the same number of queries whatever the
+    page size, with and without expanded fields, for every kind of user of
+    the `benchmark_api` command.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('seed_perf_data', users=100, clubs=5, posts=200,
+                     conversations=100, projects=20, feedbacks=50,
+                     requests=50, stdout=StringIO())
+
+    def get_page(self, command, user, path, params):
+        """
+        Requests the list route at `path` with the query parameters `params`
+        as a fresh instance of `user`, without the cached responses of
+        previous requests.
+        """
+        cache.clear()
+        command.authenticate(self.client, user)
+        return self.client.get(path, params)
+
+    def assert_constant_queries(self, command, user, path, page_sizes,
+                                **params):
+        """
+        Asserts that `user` requests pages of each of `page_sizes` rows of
+        the list route at `path` with the same number of queries.
+        """
+        first_size, *page_sizes = page_sizes
+        with CaptureQueriesContext(connection) as captured:
+            response = self.get_page(command, user, path,
+                                     dict(params, limit=first_size))
+        self.assertEqual(response.status_code, 200)
+        for page_size in page_sizes:
+            with self.assertNumQueries(len(captured)):
+                self.get_page(command, user, path,
+                              dict(params, limit=page_size))
+
+    def test_list_routes(self):
+        self.client = APIClient()
+        command = benchmark_api.Command()
+        for archetype, user in command.get_users().items():
+            for prefix, viewset, basename in router.registry:
+                path = reverse('{}-list'.format(basename))
+                with self.subTest(archetype=archetype, path=path):
+                    self.assert_constant_queries(
+                        command, user, path,
+                        benchmark_api.SCALING_PAGE_SIZES)
+                for expand in command.get_expansions(basename):
+                    with self.subTest(archetype=archetype, path=path,
+                                      expand=expand):
+                        self.assert_constant_queries(
+                            command, user, path,
+                            benchmark_api.EXPAND_SCALING_PAGE_SIZES,
+                            expand=expand)
+
+
+class SearchTests(ScopeTestCase):
+    """
+    Tests of the search of the content of Conversations.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.member)
+        channel = models.Channel.objects.get(club=self.club_a)
+        self.conversations = {content: models.Conversation.objects.create(
+            content=content, channel=channel, author=self.member).id
+            for content in ('Football match on Sunday',
+                            'Football football football',
+                            'Ball game',
+                            'The basketball court')}
+
+    def get_ids(self, params):
+        response = self.client.get(reverse('conversation-list'), params)
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data['results']]
+
+    @skipUnless(connection.vendor == 'sqlite',
+                'Only SQLite indexes rows which are not committed.')
+    def test_prefix_matching(self):
+        self.assertEqual(
+            set(self.get_ids({'search': 'foot'})),
+            {self.conversations['Football match on Sunday'],
+             self.conversations['Football football football']})
+        # Terms only match the start of words
+        self.assertEqual(self.get_ids({'search': 'ball'}),
+                         [self.conversations['Ball game']])
+        self.assertEqual(self.get_ids({'search': 'football sun'}),
+                         [self.conversations['Football match on Sunday']])
+
+    @skipUnless(connection.vendor == 'sqlite',
+                'Only SQLite indexes rows which are not committed.')
+    def test_ranked(self):
+        self.assertEqual(
+            self.get_ids({'search': 'football', 'ranked': 1}),
+            [self.conversations['Football football football'],
+             self.conversations['Football match on Sunday']])
+        response = self.client.get(reverse('conversation-list'),
+                                   {'search': 'football', 'ranked': 1,
+                                    'pagination': 'cursor', 'limit': 1})
+        self.assertEqual(response.status_code, 200)
+
+    def test_mysql_unindexed_terms(self):
+        backend = search.MySQLFullTextSearchBackend()
+        self.assertEqual(
+            backend.get_indexed_terms(['The', 'go', 'football', 'sun']),
+            ['football', 'sun'])
+        # Without any indexed term, the search falls back to LIKE
+        queryset = backend.search(models.Conversation.objects.all(),
+                                  'content', ['the', 'a'], False)
+        self.assertEqual(list(queryset.values_list('id', flat=True)),
+                         [self.conversations['The basketball court']])
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """
+    Tests of the cache of the Tokens authenticated by
+    CachedTokenAuthentication, and of its eviction.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'member', password='password')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def get_users(self):
+        return self.client.get(reverse('user-list')).status_code
+
+    def get_cached(self):
+        return cache.get(authentication._token_cache_key(self.token.key))
+
+    def test_cached_values(self):
+        self.assertEqual(self.get_users(), 200)
+        cached = self.get_cached()
+        self.assertEqual(cached['id'], self.user.id)
+        self.assertNotIn('password', cached)
+        self.assertNotIn(self.token.key, repr(cached))
+        self.assertNotIn(self.user.password, repr(cached))
+
+        # The User is then authenticated without any query
+        user, token = authentication.CachedTokenAuthentication() \
+            .authenticate_credentials(self.token.key)
+        with self.assertNumQueries(0):
+            self.assertEqual((user.id, user.username, user.is_active),
+                             (self.user.id, 'member', True))
+            self.assertEqual((token.key, token.user_id),
+                             (self.token.key, self.user.id))
+        # Unless the password is needed
+        with self.assertNumQueries(1):
+            self.assertTrue(user.check_password('password'))
+
+    def test_logout(self):
+        self.assertEqual(self.get_users(), 200)
+        response = self.client.post(reverse('rest_logout'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(self.get_cached())
+        self.assertEqual(self.get_users(), 401)
+
+    def test_token_deleted(self):
+        self.assertEqual(self.get_users(), 200)
+        Token.objects.filter(user=self.user).delete()
+        self.assertIsNone(self.get_cached())
+        self.assertEqual(self.get_users(), 401)
+
+    def test_password_changed(self):
+        self.assertEqual(self.get_users(), 200)
+        user = get_user_model().objects.get(pk=self.user.pk)
+        user.set_password('other password')
+        user.save()
+        self.assertIsNone(self.get_cached())
+
+    def test_deactivated(self):
+        self.assertEqual(self.get_users(), 200)
+        user = get_user_model().objects.get(pk=self.user.pk)
+        user.is_active = False
+        user.save()
+        self.assertEqual(self.get_users(), 401)
+
+
+class GenerationTests(TransactionTestCase):
+    """
+    Tests of the generations of `api.generations` and of the cache keys made
+    of them. The generations are only bumped once the transaction is
+    committed.
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def test_make_key(self):
+        scopes = [2, 1, generations.CLUB_DIRECTORY]
+        key = generations.make_key('test', scopes, 'part')
+        self.assertTrue(key.startswith('test:'))
+        self.assertEqual(generations.make_key('test', reversed(scopes),
+                                              'part'), key)
+        self.assertNotEqual(generations.make_key('test', scopes, 'other'),
+                            key)
+        self.assertNotEqual(generations.make_key('test', [1, 2], 'part'),
+                            key)
+
+    def test_bump_on_commit(self):
+        scopes = [1, generations.CLUB_DIRECTORY]
+        key = generations.make_key('test', scopes)
+        other_key = generations.make_key('test', [2])
+        with transaction.atomic():
+            generations.bump([1, None])
+            self.assertEqual(generations.make_key('test', scopes), key)
+        self.assertNotEqual(generations.make_key('test', scopes), key)
+        self.assertEqual(generations.make_key('test', [2]), other_key)
+
+    def test_bump_rolled_back(self):
+        key = generations.make_key('test', [1])
+        try:
+            with transaction.atomic():
+                generations.bump([1])
+                raise RuntimeError()
+        except RuntimeError:
+            pass
+        self.assertEqual(generations.make_key('test', [1]), key)
+
+    def test_evicted(self):
+        generation = generations.get_generation(generations.CLUB_DIRECTORY)
+        cache.clear()
+        self.assertNotEqual(
+            generations.get_generation(generations.CLUB_DIRECTORY),
+            generation)
+
+
+class ChecksTests(SimpleTestCase):
+    """
+    Tests of the system checks of this app.
+    """
+
+    def test_token_version_cache(self):
+        for backend, expected in (
+                ('django.core.cache.backends.locmem.LocMemCache',
+                 ['api.W001']),
+                ('django.core.cache.backends.memcached.MemcachedCache', []),
+        ):
+            with self.subTest(backend), override_settings(
+                    CACHES={'default': {'BACKEND': backend}}):
+                self.assertEqual(
+                    [warning.id for warning in
+                     checks.check_token_version_cache(None)],
+                    expected)
+
+        with override_settings(REST_FRAMEWORK={}):
+            self.assertEqual(checks.check_token_version_cache(None), [])
+
+
+class SchemaTests(TestCase):
+    """
+    Tests of the precomputed OpenAPI schema and of its ETag.
+    """
+
+    def test_etag(self):
+        client = APIClient()
+        response = client.get(reverse('schema-json',
+                                      kwargs={'format': '.json'}))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('paths', response.json())
+        etag = response['ETag']
+
+        response = client.get(reverse('schema-json',
+                                      kwargs={'format': '.json'}),
+                              HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_ui(self):
+        client = APIClient()
+        for name in ('schema-swagger-ui', 'schema-redoc'):
+            with self.subTest(name):
+                self.assertEqual(client.get(reverse(name)).status_code, 200)
+
+    def test_build_schema(self):
+        stdout = StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'schema.json')
+            call_command('build_schema', path, stdout=stdout)
+            with open(path) as output:
+                self.assertIn('paths', json.load(output))
+        self.assertIn(schema.get_code_version(), stdout.getvalue())
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    """
+    Email backend which fails to send any email.
+    """
+
+    def send_messages(self, email_messages):
+        raise ConnectionRefusedError('The SMTP server is down.')
+
+
+@override_settings(EMAIL_BACKEND='api.mail.OutboxEmailBackend',
+                   OUTBOX_RETRY_DELAY=60, OUTBOX_MAX_ATTEMPTS=3)
+class OutboxTests(TestCase):
+    """
+    Tests of the queuing of emails in the outbox and of the `send_outbox`
+    command.
+    """
+
+    def setUp(self):
+        mail.send_mail('Subject', 'Body', 'from@example.com',
+                       ['to@example.com'])
+        mail.send_mail('Other', 'Body', 'from@example.com',
+                       ['to@example.com', 'cc@example.com'])
+
+    def send_outbox(self, backend):
+        stderr = StringIO()
+        call_command('send_outbox', backend=backend, stdout=StringIO(),
+                     stderr=stderr)
+        return stderr.getvalue()
+
+    def make_due(self):
+        models.OutboxEmail.objects.update(next_attempt=timezone.now())
+
+    def test_send(self):
+        # The emails are only queued
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(models.OutboxEmail.objects.count(), 2)
+        self.send_outbox('django.core.mail.backends.locmem.EmailBackend')
+        self.assertEqual(sorted(message.subject for message in mail.outbox),
+                         ['Other', 'Subject'])
+        for email in models.OutboxEmail.objects.all():
+            self.assertEqual(email.status, constants.EMAIL_STATUS_SENT)
+            self.assertEqual(email.attempts, 1)
+            self.assertIsNotNone(email.sent)
+
+        # Sent emails are not sent again
+        self.make_due()
+        self.send_outbox('django.core.mail.backends.locmem.EmailBackend')
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_retry_with_backoff(self):
+        for attempt in range(1, 3):
+            start = timezone.now()
+            self.send_outbox('api.tests.FailingEmailBackend')
+            end = timezone.now()
+            delay = datetime.timedelta(seconds=60 * 2 ** (attempt - 1))
+            for email in models.OutboxEmail.objects.all():
+                self.assertEqual(email.status, constants.EMAIL_STATUS_QUEUED)
+                self.assertEqual(email.attempts, attempt)
+                self.assertEqual(
+                    email.last_error,
+                    'ConnectionRefusedError: The SMTP server is down.')
+                self.assertTrue(start + delay <= email.next_attempt <=
+                                end + delay)
+
+            # Not due yet
+            self.send_outbox('api.tests.FailingEmailBackend')
+            self.assertFalse(models.OutboxEmail.objects.exclude(
+                attempts=attempt).exists())
+            self.make_due()
+
+        # Sent once the backend works again
+        self.send_outbox('django.core.mail.backends.locmem.EmailBackend')
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertFalse(models.OutboxEmail.objects.exclude(
+            status=constants.EMAIL_STATUS_SENT).exists())
+
+    def test_give_up(self):
+        for attempt in range(3):
+            self.make_due()
+            stderr = self.send_outbox('api.tests.FailingEmailBackend')
+        self.assertEqual(stderr.count('Giving up on email'), 2)
+        for email in models.OutboxEmail.objects.all():
+            self.assertEqual(email.status, constants.EMAIL_STATUS_FAILED)
+            self.assertEqual(email.attempts, 3)
+
+        # Failed emails are not tried again
+        self.make_due()
+        self.send_outbox('django.core.mail.backends.locmem.EmailBackend')
+        self.assertEqual(len(mail.outbox), 0)
@@ -0,0 +1,177 @@
+"""
+This module contains the home timeline of a User, read from its
+TimelineEntries and merged with the Posts of the Channels that are read on
+demand.
+
+Ordering Posts selected by a subquery on the timeline sorts all of them
+before the first page can be returned. The TimelineEntries of a User are
+instead read in the order of their `(user, created, post)` index, and the
+Posts of every Channel in the order of their `(channel, created)` index, so
+that reading a page reads at most that many rows from each of them.
+"""
+
+import heapq
+
+from django.db.models import Q
+
+from . import models
+
+# Fields of a Post that TimelineEntry has the value of, and the name of the
+# field of TimelineEntry which holds it.
+ENTRY_FIELDS = {
+    'id': 'post_id',
+    'pk': 'post_id',
+    'created': 'created',
+    'channel': 'channel',
+    'channel_id': 'channel_id',
+}
+
+
+def get_entry_lookup(lookup):
+    """
+    Returns the lookup on TimelineEntry matching the lookup `lookup` on Post.
+    """
+    name, separator, rest = lookup.partition('__')
+    if name in ENTRY_FIELDS:
+        return ENTRY_FIELDS[name] + separator + rest
+    return 'post__' + lookup
+
+
+def get_entry_ordering(field):
+    """
+    Returns the ordering field on TimelineEntry matching the ordering field
+    `field` on Post.
+    """
+    if field.startswith('-'):
+        return '-' + get_entry_lookup(field[1:])
+    return get_entry_lookup(field)
+
+
+def get_entry_q(q):
+    """
+    Returns a copy of the Q object `q` with its lookups on Post replaced by
+    the matching lookups on TimelineEntry.
+    """
+    entry_q = Q()
+    entry_q.connector = q.connector
+    entry_q.negated = q.negated
+    entry_q.children = [
+        get_entry_q(child) if isinstance(child, Q)
+        else (get_entry_lookup(child[0]), child[1])
+        for child in q.children
+    ]
+    return entry_q
+
+
+class HomeTimeline(object):
+    """
+    The Posts in the home timeline of `user`, which are those of its
+    TimelineEntries and of the subscribed Channels whose Posts are read on
+    demand, taken from `queryset`.
+
+    It implements the part of the QuerySet API used by the readers and the
+    paginators of the list routes: `values()`, `order_by()`, `filter()` and
+    `count()` are applied to the TimelineEntries of the User and to the Posts
+    of each Channel read on demand, and slicing merges their rows. Lookups
+    on fields of Posts which TimelineEntry holds a copy of are made on
+    TimelineEntry. All the ordering fields must be in the same direction.
+    """
+
+    def __init__(self, user, queryset):
+        self.user = user
+        self.queryset = queryset
+        self.ordering = ('-created', '-id')
+        self.lookups = None
+        self.filters = []
+
+    def _clone(self, **attributes):
+        clone = HomeTimeline(self.user, self.queryset)
+        clone.ordering = self.ordering
+        clone.lookups = self.lookups
+        clone.filters = list(self.filters)
+        clone.__dict__.update(attributes)
+        return clone
+
+    def order_by(self, *fields):
+        assert len(set(field.startswith('-') for field in fields)) <= 1, \
+            'The timeline can only be ordered in a single direction.'
+        return self._clone(ordering=tuple(fields))
+
+    def filter(self, *args, **kwargs):
+        return self._clone(filters=self.filters + [Q(*args, **kwargs)])
+
+    def values(self, *lookups):
+        return self._clone(lookups=tuple(lookups))
+
+    def prefetch_related(self, *lookups):
+        # The rows of the timeline have nothing to prefetch.
+        return self._clone()
+
+    def get_querysets(self):
+        """
+        Returns the queryset of the TimelineEntries of the User followed by
+        the querysets of the Posts of every Channel which is read on demand,
+        all filtered and ordered as the timeline.
+        """
+        entries = models.TimelineEntry.objects.filter(
+            user__id=self.user.id,
+        ).order_by(*[get_entry_ordering(field) for field in self.ordering])
+        for q in self.filters:
+            entries = entries.filter(get_entry_q(q))
+        if self.lookups is None:
+            entries = entries.select_related('post')
+        else:
+            entries = entries.values(*[get_entry_lookup(lookup)
+                                       for lookup in self.lookups])
+
+        channel_ids = models.ChannelSubscription.objects.filter(
+            user__id=self.user.id,
+            channel__fanout_on_read=True,
+        ).values_list('channel_id', flat=True)
+        posts = self.queryset.order_by(*self.ordering)
+        for q in self.filters:
+            posts = posts.filter(q)
+        if self.lookups is not None:
+            posts = posts.values(*self.lookups)
+        return [entries] + [posts.filter(channel__id=channel_id)
+                            for channel_id in channel_ids]
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.get_querysets())
+
+    def read(self, queryset, stop):
+        """
+        Returns the first `stop` rows of `queryset` among the querysets of
+        the timeline, or all of them if `stop` is None, as rows of Posts.
+        """
+        objects = queryset[:stop] if stop is not None else queryset
+        if queryset.model is models.Post:
+            return list(objects)
+        if self.lookups is None:
+            return [entry.post for entry in objects]
+        names = [(lookup, get_entry_lookup(lookup))
+                 for lookup in self.lookups]
+        return [{lookup: row[name] for lookup, name in names}
+                for row in objects]
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step is not None:
+            raise TypeError('The timeline only supports slicing.')
+        fields = [field.lstrip('-') for field in self.ordering]
+        if self.lookups is None:
+            def key(post):
+                return tuple(getattr(post, field) for field in fields)
+        else:
+            def key(row):
+                return tuple(row[field] for field in fields)
+        reverse = bool(self.ordering) and self.ordering[0].startswith('-')
+        merged = heapq.merge(*[self.read(queryset, index.stop)
+                               for queryset in self.get_querysets()],
+                             key=key, reverse=reverse)
+        return list(merged)[index.start:index.stop]
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __len__(self):
+        return len(self[:])
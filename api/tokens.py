@@ -0,0 +1,163 @@
+"""
+This module contains the signed access tokens and the refresh tokens.
+
+An access token is signed with the SECRET_KEY and carries the id of its User,
+whether the User is a secretary and the privilege of the User in each of
+its Clubs, so that requests authenticated with it can be authorized without
+any query. It is valid for `ACCESS_TOKEN_LIFETIME` seconds.
+
+It also carries the token version of its User, kept in the Django cache and
+bumped by the signal receivers in `api.signals` whenever the memberships or
+the account of the User change. An access token with an older version is
+rejected, and the client has to get a new one with its refresh token. The
+cache must be shared by all the server processes, see `api.checks`.
+Refresh tokens are stored in the RefreshToken model, are valid for
+`REFRESH_TOKEN_LIFETIME` seconds and are replaced on every use.
+"""
+
+import datetime
+import hashlib
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, get_random_string
+
+from . import models
+from .membership import MembershipContext
+
+# Salt of the signature of the access tokens.
+ACCESS_TOKEN_SALT = 'api.tokens.access'
+
+# Prefix of the cache keys of the token versions.
+VERSION_KEY_PREFIX = 'api:token-version:'
+
+
+class InvalidToken(Exception):
+    """
+    Exception to raise when a token is invalid, expired or revoked.
+    """
+    pass
+
+
+def _version_key(user_id):
+    return '{}{}'.format(VERSION_KEY_PREFIX, user_id)
+
+
+def _new_version():
+    # Created from the current time so that a version evicted from the
+    # cache is never repeated.
+    return int(time.time() * 1000000)
+
+
+def get_version(user_id):
+    """
+    Returns the current token version of the User with id `user_id`.
+    """
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        cache.add(_version_key(user_id), _new_version(), timeout=None)
+        version = cache.get(_version_key(user_id))
+    return version
+
+
+def bump_versions(user_ids):
+    """
+    Bumps the token versions of the Users with ids in `user_ids` once the
+    current transaction is committed, which revokes their access tokens.
+    """
+    user_ids = set(user_ids)
+    if user_ids:
+        transaction.on_commit(lambda: _bump_versions_now(user_ids))
+
+
+def _bump_versions_now(user_ids):
+    for user_id in user_ids:
+        try:
+            cache.incr(_version_key(user_id))
+        except ValueError:
+            cache.set(_version_key(user_id), _new_version(), timeout=None)
+
+
+def make_access_token(user):
+    """
+    Returns a new signed access token for `user`.
+    """
+    # Read the version first, so that a change of the memberships while
+    # they are read revokes the token.
+    version = get_version(user.id)
+    privileges = MembershipContext(user).privileges
+    return signing.dumps({
+        'uid': user.id,
+        'sec': user.is_secretary,
+        'clubs': dict((str(club_id), privilege)
+                      for club_id, privilege in privileges.items()),
+        'ver': version,
+    }, salt=ACCESS_TOKEN_SALT, compress=True)
+
+
+def read_access_token(token):
+    """
+    Returns the payload of the access token `token`, with the ids of the
+    Clubs as integers. Raises InvalidToken if the token is invalid, expired
+    or revoked.
+    """
+    try:
+        payload = signing.loads(token, salt=ACCESS_TOKEN_SALT,
+                                max_age=settings.ACCESS_TOKEN_LIFETIME)
+    except signing.BadSignature:
+        raise InvalidToken('Invalid or expired token.')
+    if payload['ver'] != get_version(payload['uid']):
+        raise InvalidToken('Revoked token.')
+    payload['clubs'] = dict((int(club_id), privilege)
+                            for club_id, privilege in payload['clubs'].items())
+    return payload
+
+
+def _hash_key(key):
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def issue_tokens(user):
+    """
+    Creates a new refresh token for `user` and returns a dict with it and a
+    new access token.
+    """
+    key = get_random_string(64)
+    models.RefreshToken.objects.create(
+        user=user,
+        key_hash=_hash_key(key),
+        session_hash=user.get_session_auth_hash(),
+        expires=timezone.now() + datetime.timedelta(
+            seconds=settings.REFRESH_TOKEN_LIFETIME),
+    )
+    return {
+        'access_token': make_access_token(user),
+        'refresh_token': key,
+        'expires_in': settings.ACCESS_TOKEN_LIFETIME,
+    }
+
+
+def refresh_tokens(key):
+    """
+    Replaces the refresh token `key` by a new one and returns a dict with it
+    and a new access token, like `issue_tokens()`. Raises InvalidToken if the
+    refresh token is unknown or expired, or if the password of its User has
+    changed or the User is inactive since it was issued.
+    """
+    with transaction.atomic():
+        refresh_token = models.RefreshToken.objects.select_for_update() \
+            .select_related('user').filter(key_hash=_hash_key(key)).first()
+        if refresh_token is None:
+            raise InvalidToken('Invalid refresh token.')
+        refresh_token.delete()
+        user = refresh_token.user
+        if refresh_token.expires >= timezone.now() and user.is_active and \
+                constant_time_compare(refresh_token.session_hash,
+                                      user.get_session_auth_hash()):
+            return issue_tokens(user)
+    # Raised once the deletion of the stale token is committed
+    raise InvalidToken('Expired refresh token.')
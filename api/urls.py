@@ -4,10 +4,10 @@ This module registers URL patterns for the 'api' app.
 
 from django.conf.urls import url, include
 from drf_yasg import openapi
-from drf_yasg.views import get_schema_view
 from rest_framework import permissions
 
 from . import views
+from .schema import get_precomputed_schema_view
 from .routers import CustomDefaultRouter
 
 # Create a router and register the Viewsets with it.
@@ -25,8 +25,8 @@ router.register(r'projectMembers', views.ProjectMembershipViewSet)
 router.register(r'feedbacks', views.FeedbackViewSet)
 router.register(r'replies', views.FeedbackReplyViewSet)
 
-# Create the schema view
-schema_view = get_schema_view(
+# Create the schema view, which generates the schema only once
+schema_view = get_precomputed_schema_view(
     openapi.Info(
         title="Focus API",
         default_version="v1",
@@ -3,6 +3,7 @@ This module contains the controllers attached to the API endpoints.
 """
 
 from django.contrib.auth import get_user_model
+from django.db.models import prefetch_related_objects
 
 from rest_framework import exceptions as rest_exceptions
 from rest_framework import filters as rest_filters
@@ -12,10 +13,15 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 
 from . import models, serializers, permissions, filters, exceptions
+from . import generations, pagination
 from . import viewsets as custom_viewsets
+from .membership import get_context
 
 
-class UserViewSet(viewsets.ReadOnlyModelViewSet):
+class UserViewSet(custom_viewsets.ExpandMixin,
+                  custom_viewsets.ValuesListMixin,
+                  custom_viewsets.EagerLoadingMixin,
+                  viewsets.ReadOnlyModelViewSet):
     """
     retrieve:
         Return the details of given User.
@@ -25,9 +31,15 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = get_user_model().objects.all()
     serializer_class = serializers.UserSerializer
     permission_classes = (rest_permissions.IsAuthenticated,)
+    eager_loading = {
+        '*': {'only': serializers.UserSerializer.Meta.fields},
+    }
 
 
-class ClubViewSet(viewsets.ModelViewSet):
+class ClubViewSet(custom_viewsets.ExpandMixin,
+                  custom_viewsets.SharedListCacheMixin,
+                  custom_viewsets.SparseFieldsMixin,
+                  viewsets.ModelViewSet):
     """
     retrieve:
         Return the details of given Club.
@@ -48,17 +60,45 @@ class ClubViewSet(viewsets.ModelViewSet):
     filter_backends = (rest_filters.SearchFilter,
                        filters.ClubFilter)
     search_fields = ('name',)
+    overlay_fields = ('privilege',)
+
+    def get_shared_scopes(self):
+        """
+        The list of Clubs is the same for every User except for the
+        privilege, unless only the Clubs of the current User are requested.
+        """
+        try:
+            only_my_clubs = bool(int(
+                self.request.query_params.get('only_my', 0)))
+        except ValueError:
+            raise rest_exceptions.ParseError
+        fields = self.get_sparse_fields()
+        if only_my_clubs or (fields is not None and 'privilege' in fields
+                             and 'id' not in fields):
+            return None
+        return [generations.CLUB_DIRECTORY]
+
+    def overlay(self, objects):
+        """
+        Add the privilege of the current User to every Club, from a single
+        query of the memberships of the User.
+        """
+        context = get_context(self.request.user)
+        for club in objects:
+            club['privilege'] = context.get_privilege(club['id'])
 
     def create(self, request, *args, **kwargs):
         """
         Create a new Club. Only a secretary is allowed to create a new Club.
         """
-        if not request.user.is_secretary:
+        if not get_context(request.user).is_secretary:
             raise rest_exceptions.PermissionDenied()
         return super(ClubViewSet, self).create(request, *args, **kwargs)
 
 
-class ClubMembershipRequestViewSet(custom_viewsets.CreateListRetrieveViewSet):
+class ClubMembershipRequestViewSet(custom_viewsets.ExpandMixin,
+                                   custom_viewsets.SparseFieldsMixin,
+                                   custom_viewsets.CreateListRetrieveViewSet):
     """
     retrieve:
         Return the details of given ClubMembershipRequest.
@@ -77,6 +117,8 @@ class ClubMembershipRequestViewSet(custom_viewsets.CreateListRetrieveViewSet):
     permission_classes = (rest_permissions.IsAuthenticated,
                           permissions.ClubMembershipRequestPermission,)
     filter_backends = (filters.ClubMembershipRequestFilter,)
+    pagination_class = pagination.TimelinePagination
+    timeline_field = 'initiated'
 
     def create(self, request, *args, **kwargs):
         """
@@ -87,7 +129,7 @@ class ClubMembershipRequestViewSet(custom_viewsets.CreateListRetrieveViewSet):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         club = serializer.validated_data['club']
-        if club.has_member(request.user):
+        if get_context(request.user).is_member(club.id):
             raise exceptions.ActionNotAvailable(
                 action='create',
                 detail='You are already a member!'
@@ -114,7 +156,7 @@ class ClubMembershipRequestViewSet(custom_viewsets.CreateListRetrieveViewSet):
         for which request is made and if the request is still pending.
         """
         membership_request = self.get_object()
-        if not membership_request.club.has_rep(request.user):
+        if not get_context(request.user).is_rep(membership_request.club_id):
             raise rest_exceptions.PermissionDenied()
         membership_request.accept()
         serializer = self.serializer_class(membership_request)
@@ -127,7 +169,7 @@ class ClubMembershipRequestViewSet(custom_viewsets.CreateListRetrieveViewSet):
         for which request is made and if the request is still pending.
         """
         membership_request = self.get_object()
-        if not membership_request.club.has_rep(request.user):
+        if not get_context(request.user).is_rep(membership_request.club_id):
             raise rest_exceptions.PermissionDenied()
         membership_request.reject()
         serializer = self.serializer_class(membership_request)
@@ -147,7 +189,9 @@ class ClubMembershipRequestViewSet(custom_viewsets.CreateListRetrieveViewSet):
         return Response(serializer.data)
 
 
-class ClubRoleViewSet(viewsets.ModelViewSet):
+class ClubRoleViewSet(custom_viewsets.ExpandMixin,
+                      custom_viewsets.SparseFieldsMixin,
+                      viewsets.ModelViewSet):
     """
     retrieve:
         Return the details of given ClubRole if current user is a member of the
@@ -172,7 +216,10 @@ class ClubRoleViewSet(viewsets.ModelViewSet):
     filter_backends = (filters.ClubRoleFilter,)
 
 
-class ClubMembershipViewSet(viewsets.ModelViewSet):
+class ClubMembershipViewSet(custom_viewsets.ExpandMixin,
+                            custom_viewsets.ValuesListMixin,
+                            custom_viewsets.EagerLoadingMixin,
+                            viewsets.ModelViewSet):
     """
     retrieve:
         Return the details of given ClubMembership if current user is a member
@@ -193,6 +240,9 @@ class ClubMembershipViewSet(viewsets.ModelViewSet):
     permission_classes = (rest_permissions.IsAuthenticated,
                           permissions.ClubMembershipPermission)
     filter_backends = (filters.ClubMembershipFilter,)
+    eager_loading = {
+        '*': {'select_related': ('club_role',)},
+    }
 
     def get_serializer_class(self):
         if self.action == 'retrieve' or self.action == 'update' or \
@@ -222,7 +272,10 @@ class ClubMembershipViewSet(viewsets.ModelViewSet):
             request, *args, **kwargs)
 
 
-class ChannelViewSet(custom_viewsets.UpdateListRetrieveViewSet):
+class ChannelViewSet(custom_viewsets.ExpandMixin,
+                     custom_viewsets.ConditionalGetMixin,
+                     custom_viewsets.SparseFieldsMixin,
+                     custom_viewsets.UpdateListRetrieveViewSet):
     """
     retrieve:
         Return the details of the given Channel.
@@ -284,7 +337,10 @@ class ChannelViewSet(custom_viewsets.UpdateListRetrieveViewSet):
         return Response(serializer.data)
 
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(custom_viewsets.ExpandMixin,
+                  custom_viewsets.ValuesListMixin,
+                  custom_viewsets.EagerLoadingMixin,
+                  viewsets.ModelViewSet):
     """
     retrieve:
         Return the details of given Post.
@@ -304,11 +360,18 @@ class PostViewSet(viewsets.ModelViewSet):
     """
     queryset = models.Post.objects.all()
     serializer_class = serializers.PostSerializer
-    filter_backends = (rest_filters.SearchFilter,
-                       filters.PostFilter)
+    filter_backends = (filters.PostFilter,
+                       filters.ContentSearchFilter)
     permission_classes = (rest_permissions.IsAuthenticated,
                           permissions.PostPermission)
-    search_fields = ('content',)
+    search_field = 'content'
+    pagination_class = pagination.TimelinePagination
+    timeline_field = 'created'
+    eager_loading = {
+        'update': {'select_related': ('channel',)},
+        'partial_update': {'select_related': ('channel',)},
+        'destroy': {'select_related': ('channel',)},
+    }
 
     def create(self, request, *args, **kwargs):
         """
@@ -317,13 +380,16 @@ class PostViewSet(viewsets.ModelViewSet):
         """
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        club = serializer.validated_data['channel'].club
-        if not club.has_rep(request.user):
+        channel = serializer.validated_data['channel']
+        if not get_context(request.user).is_rep(channel.club_id):
             raise rest_exceptions.PermissionDenied()
         return super(PostViewSet, self).create(request, *args, **kwargs)
 
 
-class ConversationViewSet(custom_viewsets.CreateListRetrieveViewSet):
+class ConversationViewSet(custom_viewsets.ExpandMixin,
+                          custom_viewsets.ValuesListMixin,
+                          custom_viewsets.EagerLoadingMixin,
+                          custom_viewsets.CreateListRetrieveViewSet):
     """
     retrieve:
         Return the details of the given Conversation. Only members of the
@@ -338,11 +404,16 @@ class ConversationViewSet(custom_viewsets.CreateListRetrieveViewSet):
     """
     queryset = models.Conversation.objects.all()
     serializer_class = serializers.ConversationSerializer
-    filter_backends = (rest_filters.SearchFilter,
-                       filters.ConversationFilter)
+    filter_backends = (filters.ConversationFilter,
+                       filters.ContentSearchFilter)
     permission_classes = (rest_permissions.IsAuthenticated,
                           permissions.ConversationPermission)
-    search_fields = ('content',)
+    search_field = 'content'
+    pagination_class = pagination.TimelinePagination
+    timeline_field = 'created'
+    eager_loading = {
+        '*': {'select_related': ('author', 'channel')},
+    }
 
     def create(self, request, *args, **kwargs):
         """
@@ -351,8 +422,8 @@ class ConversationViewSet(custom_viewsets.CreateListRetrieveViewSet):
         """
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        club = serializer.validated_data['channel'].club
-        if not club.has_member(request.user):
+        channel = serializer.validated_data['channel']
+        if not get_context(request.user).is_member(channel.club_id):
             raise rest_exceptions.PermissionDenied()
         return super(ConversationViewSet, self).create(
             request, *args, **kwargs)
@@ -364,8 +435,45 @@ class ConversationViewSet(custom_viewsets.CreateListRetrieveViewSet):
         """
         serializer.save(author=self.request.user)
 
-
-class ProjectViewSet(custom_viewsets.ReadWriteOnlyViewSet):
+    @action(detail=True, methods=['get'])
+    def thread(self, request, pk=None):
+        """
+        Return the given Conversation with all of its replies nested under
+        it in `replies`, ordered by creation time. If `depth` is provided,
+        only return replies up to that many levels deep, it must not be
+        negative.
+        """
+        conversation = self.get_object()
+        depth = request.query_params.get('depth')
+        if depth is not None:
+            try:
+                depth = int(depth)
+            except ValueError:
+                raise rest_exceptions.ParseError('Invalid depth.')
+            if depth < 0:
+                raise rest_exceptions.ParseError(
+                    'The depth must not be negative.')
+        conversations = conversation.get_thread(max_depth=depth)
+        prefetch_related_objects(conversations, 'author')
+        serializer = self.get_serializer(conversations, many=True)
+
+        # Conversations are ordered by depth, so every parent is seen before
+        # its replies.
+        nodes = {}
+        for reply, node in zip(conversations, serializer.data):
+            node['depth'] = reply.depth
+            node['replies'] = []
+            nodes[reply.id] = node
+            if reply.depth:
+                nodes[reply.parent_id]['replies'].append(node)
+        return Response(nodes[conversation.id])
+
+
+class ProjectViewSet(custom_viewsets.ExpandMixin,
+                     custom_viewsets.ConditionalGetMixin,
+                     custom_viewsets.SparseFieldsMixin,
+                     custom_viewsets.EagerLoadingMixin,
+                     custom_viewsets.ReadWriteOnlyViewSet):
     """
     retrieve:
         Return the details of given Project. Only the members of the Club or a
@@ -386,6 +494,12 @@ class ProjectViewSet(custom_viewsets.ReadWriteOnlyViewSet):
     permission_classes = (rest_permissions.IsAuthenticated,
                           permissions.ProjectPermission)
     filter_backends = (filters.ProjectFilter,)
+    eager_loading = {
+        # The permissions of the Projects expanded in other responses need
+        # their Clubs.
+        'retrieve': {'prefetch_related': ('members', 'clubproject_set')},
+        '*': {'prefetch_related': ('members',)},
+    }
 
     def create(self, request, *args, **kwargs):
         """
@@ -395,7 +509,7 @@ class ProjectViewSet(custom_viewsets.ReadWriteOnlyViewSet):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         owner_club = serializer.validated_data['owner_club']
-        if not owner_club.has_rep(request.user):
+        if not get_context(request.user).is_rep(owner_club.id):
             raise rest_exceptions.PermissionDenied()
         return super(ProjectViewSet, self).create(request, *args, **kwargs)
 
@@ -406,7 +520,7 @@ class ProjectViewSet(custom_viewsets.ReadWriteOnlyViewSet):
         Only Club rep is authorized for this.
         """
         project = self.get_object()
-        if not project.owner_club.has_rep(request.user):
+        if not get_context(request.user).is_rep(project.owner_club_id):
             raise rest_exceptions.PermissionDenied()
         project.reopen()
         serializer = self.serializer_class(project)
@@ -419,14 +533,17 @@ class ProjectViewSet(custom_viewsets.ReadWriteOnlyViewSet):
         closed. Only Club rep is authorized for this.
         """
         project = self.get_object()
-        if not project.owner_club.has_rep(request.user):
+        if not get_context(request.user).is_rep(project.owner_club_id):
             raise rest_exceptions.PermissionDenied()
         project.close()
         serializer = self.serializer_class(project)
         return Response(serializer.data)
 
 
-class ProjectMembershipViewSet(custom_viewsets.CreateListRetrieveViewSet):
+class ProjectMembershipViewSet(custom_viewsets.ExpandMixin,
+                               custom_viewsets.SparseFieldsMixin,
+                               custom_viewsets.EagerLoadingMixin,
+                               custom_viewsets.CreateListRetrieveViewSet):
     """
     retrieve:
         Return the details of given ProjectMembership. Only the corresponding
@@ -447,6 +564,9 @@ class ProjectMembershipViewSet(custom_viewsets.CreateListRetrieveViewSet):
     permission_classes = (rest_permissions.IsAuthenticated,
                           permissions.ProjectMembershipPermission)
     filter_backends = (filters.ProjectMembershipFilter,)
+    eager_loading = {
+        'retrieve': {'select_related': ('project',)},
+    }
 
     def create(self, request, *args, **kwargs):
         """
@@ -456,14 +576,18 @@ class ProjectMembershipViewSet(custom_viewsets.CreateListRetrieveViewSet):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         project = serializer.validated_data['project']
+        club = serializer.validated_data['club']
         if not (project.has_leader(request.user) or
-                project.has_club_rep(request.user)):
+                get_context(request.user).is_rep(club.id)):
             raise rest_exceptions.PermissionDenied()
         return super(ProjectMembershipViewSet, self).create(
             request, *args, **kwargs)
 
 
-class FeedbackViewSet(custom_viewsets.CreateListRetrieveViewSet):
+class FeedbackViewSet(custom_viewsets.ExpandMixin,
+                      custom_viewsets.ValuesListMixin,
+                      custom_viewsets.EagerLoadingMixin,
+                      custom_viewsets.CreateListRetrieveViewSet):
     """
     retrieve:
         Return the details of the given Feedback. Only representative of the
@@ -482,6 +606,11 @@ class FeedbackViewSet(custom_viewsets.CreateListRetrieveViewSet):
     permission_classes = (rest_permissions.IsAuthenticated,
                           permissions.FeedbackPermission)
     filter_backends = (filters.FeedbackFilter,)
+    pagination_class = pagination.TimelinePagination
+    timeline_field = 'created'
+    eager_loading = {
+        '*': {'select_related': ('feedbackreply',)},
+    }
 
     def create(self, request, *args, **kwargs):
         """
@@ -491,7 +620,7 @@ class FeedbackViewSet(custom_viewsets.CreateListRetrieveViewSet):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         club = serializer.validated_data['club']
-        if not club.has_member(request.user):
+        if not get_context(request.user).is_member(club.id):
             raise rest_exceptions.PermissionDenied()
         return super(FeedbackViewSet, self).create(request, *args, **kwargs)
 
@@ -502,7 +631,10 @@ class FeedbackViewSet(custom_viewsets.CreateListRetrieveViewSet):
         serializer.save(author=self.request.user)
 
 
-class FeedbackReplyViewSet(custom_viewsets.CreateListRetrieveViewSet):
+class FeedbackReplyViewSet(custom_viewsets.ExpandMixin,
+                           custom_viewsets.SparseFieldsMixin,
+                           custom_viewsets.EagerLoadingMixin,
+                           custom_viewsets.CreateListRetrieveViewSet):
     """
     retrieve:
         Return the details of the given FeedbackReply. Only the author of the
@@ -523,6 +655,9 @@ class FeedbackReplyViewSet(custom_viewsets.CreateListRetrieveViewSet):
     permission_classes = (rest_permissions.IsAuthenticated,
                           permissions.FeedbackReplyPermission)
     filter_backends = (filters.FeedbackReplyFilter,)
+    eager_loading = {
+        'retrieve': {'select_related': ('parent',)},
+    }
 
     def create(self, request, *args, **kwargs):
         """
@@ -532,7 +667,7 @@ class FeedbackReplyViewSet(custom_viewsets.CreateListRetrieveViewSet):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         feedback = serializer.validated_data['parent']
-        if not feedback.club.has_rep(request.user):
+        if not get_context(request.user).is_rep(feedback.club_id):
             raise rest_exceptions.PermissionDenied()
         return super(FeedbackReplyViewSet, self).create(
             request, *args, **kwargs)
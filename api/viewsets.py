@@ -2,7 +2,21 @@
 This module contains the custom Viewsets required for this app.
 """
 
-from rest_framework import mixins, viewsets
+import hashlib
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from rest_framework import fields as rest_fields
+from rest_framework import mixins, permissions, viewsets
+from rest_framework.exceptions import ParseError
+from rest_framework.response import Response
+
+from . import generations, readers
+from .membership import get_context
 
 
 class CreateListRetrieveViewSet(mixins.CreateModelMixin,
@@ -34,3 +48,453 @@ class ReadWriteOnlyViewSet(mixins.CreateModelMixin,
     A viewset that provides `create`, `retrieve`, `update`, and `list` actions.
     """
     pass
+
+
+class EagerLoadingMixin(object):
+    """
+    A mixin that applies the eager loading profile of the current action to
+    the queryset of a viewset. `eager_loading` maps the name of an action, or
+    '*' for all other actions, to a dict with any of the keys
+    `select_related`, `prefetch_related` and `only`, whose values are passed
+    to the corresponding queryset methods.
+    """
+    eager_loading = {}
+
+    def get_queryset(self):
+        queryset = super(EagerLoadingMixin, self).get_queryset()
+        profile = self.eager_loading.get(self.action,
+                                         self.eager_loading.get('*', {}))
+        if profile.get('select_related'):
+            queryset = queryset.select_related(*profile['select_related'])
+        if profile.get('prefetch_related'):
+            queryset = queryset.prefetch_related(*profile['prefetch_related'])
+        if profile.get('only'):
+            queryset = queryset.only(*profile['only'])
+        return queryset
+
+
+def _select_related_paths(tree, prefix=''):
+    """
+    Yields the lookups of the relations in the `select_related` tree of a
+    query.
+    """
+    for name, subtree in tree.items():
+        if subtree:
+            yield from _select_related_paths(subtree, prefix + name + '__')
+        else:
+            yield prefix + name
+
+
+class SparseFieldsMixin(object):
+    """
+    A mixin that lets clients choose the fields of the responses to safe
+    requests, with the `fields` or `omit` query parameters. Both take a comma
+    separated list of field names. The other fields are removed from the
+    serializer, so that their SerializerMethodFields are not evaluated, and
+    the `list` action only loads the columns and relations that the remaining
+    fields need.
+    """
+    fields_query_param = 'fields'
+    omit_query_param = 'omit'
+
+    def get_sparse_fields(self):
+        """
+        Returns an ordered dict of the serializer fields selected by the query
+        parameters, or None if the response has all the fields.
+        """
+        if hasattr(self, '_sparse_fields'):
+            return self._sparse_fields
+        self._sparse_fields = None
+        request = getattr(self, 'request', None)
+        if request is None or request.method not in permissions.SAFE_METHODS:
+            return None
+        selected = request.query_params.get(self.fields_query_param, '')
+        omitted = request.query_params.get(self.omit_query_param, '')
+        selected = [name for name in selected.split(',') if name]
+        omitted = [name for name in omitted.split(',') if name]
+        if not selected and not omitted:
+            return None
+
+        fields = self.get_serializer_class()().fields
+        unknown = [name for name in selected + omitted if name not in fields]
+        if unknown:
+            raise ParseError(
+                'Unknown field(s): {}.'.format(', '.join(unknown)))
+        self._sparse_fields = OrderedDict(
+            (name, field) for name, field in fields.items()
+            if (not selected or name in selected) and name not in omitted
+        )
+        return self._sparse_fields
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super(SparseFieldsMixin, self).get_serializer(
+            *args, **kwargs)
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            target = getattr(serializer, 'child', serializer)
+            for name in list(target.fields):
+                if name not in fields:
+                    del target.fields[name]
+        return serializer
+
+    def get_queryset(self):
+        queryset = super(SparseFieldsMixin, self).get_queryset()
+        if self.action != 'list':
+            return queryset
+        fields = self.get_sparse_fields()
+        if fields is None:
+            return queryset
+        return self.narrow_queryset(queryset, fields)
+
+    def narrow_queryset(self, queryset, fields):
+        """
+        Returns `queryset` restricted to the columns and relations needed by
+        the serializer `fields`, or `queryset` unchanged if that can not be
+        told, e.g. because of a SerializerMethodField.
+        """
+        opts = queryset.model._meta
+        if queryset.query.select_related is True:
+            return queryset
+        sources = []
+        for field in fields.values():
+            if isinstance(field, rest_fields.SerializerMethodField) or \
+                    field.source == '*':
+                return queryset
+            try:
+                model_field = opts.get_field(field.source_attrs[0])
+            except FieldDoesNotExist:
+                return queryset
+            sources.append((model_field, field.source_attrs))
+        names = set(model_field.name for model_field, _ in sources)
+        # Relations whose objects are needed, not just their primary key
+        traversed = set(model_field.name for model_field, attrs in sources
+                        if len(attrs) > 1 or not model_field.concrete)
+
+        select_related = [
+            path for path in _select_related_paths(
+                queryset.query.select_related or {})
+            if path.split('__')[0] in traversed
+        ]
+        prefetch_related = [
+            lookup for lookup in queryset._prefetch_related_lookups
+            if getattr(lookup, 'prefetch_through', lookup).split('__')[0]
+            in names
+        ]
+        only = set([opts.pk.name])
+        for model_field, attrs in sources:
+            if not model_field.concrete or model_field.many_to_many:
+                continue
+            only.add(attrs[0])
+            # Columns of related objects are only loaded with select_related
+            for i in range(2, len(attrs) + 1):
+                path = '__'.join(attrs[:i])
+                if any((related + '__').startswith(path + '__') or
+                       path.startswith(related + '__')
+                       for related in select_related):
+                    only.add(path)
+
+        queryset = queryset.select_related(None).prefetch_related(None)
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset.only(*only)
+
+
+class ExpandMixin(object):
+    """
+    A mixin that embeds related objects in the responses to safe requests,
+    in place of the values of the fields listed in the `expand` query
+    parameter. Nested fields are given as dotted paths, e.g. `channel.club`.
+
+    A field can be expanded if it is in the `expandable` dict of the Meta of
+    its serializer, which maps it to the basename of the viewset of the
+    related objects, or to a `(basename, field)` tuple if its value is not
+    their primary key but another unique field. The related objects of a path
+    are loaded in one query through the queryset of that viewset, serialized
+    with its serializer, and only embedded if its permissions allow the
+    current user to retrieve them.
+    """
+    expand_query_param = 'expand'
+
+    def initial(self, request, *args, **kwargs):
+        super(ExpandMixin, self).initial(request, *args, **kwargs)
+        self.expand_tree = self.get_expand_tree()
+
+    def get_expand_tree(self):
+        """
+        Returns the fields to expand as a tree of nested dicts, after
+        checking that all of them are expandable.
+        """
+        if self.request.method not in permissions.SAFE_METHODS:
+            return {}
+        tree = {}
+        for path in self.request.query_params.get(self.expand_query_param,
+                                                  '').split(','):
+            node = tree
+            serializer_class = self.get_serializer_class()
+            for name in path.split('.') if path else ():
+                if name not in getattr(serializer_class.Meta, 'expandable',
+                                       {}):
+                    raise ParseError(
+                        'Field "{}" can not be expanded.'.format(path))
+                view, _ = self.get_expand_view(serializer_class, name)
+                serializer_class = view.get_serializer_class()
+                node = node.setdefault(name, {})
+        return tree
+
+    def get_expand_view(self, serializer_class, name):
+        """
+        Returns an instance of the viewset that retrieves the objects of the
+        expandable field `name` of `serializer_class`, and the field of
+        these objects that the values refer to.
+        """
+        # Imported here as the URL configuration imports the views
+        from .urls import router
+
+        target = serializer_class.Meta.expandable[name]
+        basename, to_field = (target, 'pk') if isinstance(target, str) \
+            else target
+        for _, viewset, registered_basename in router.registry:
+            if registered_basename == basename:
+                view = viewset(request=self.request, args=(), kwargs={},
+                               format_kwarg=None, action='retrieve')
+                return view, to_field
+        raise ValueError('No viewset is registered for "{}".'.format(
+            basename))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super(ExpandMixin, self).finalize_response(
+            request, response, *args, **kwargs)
+        if getattr(self, 'expand_tree', None) and \
+                response.status_code == 200:
+            data = response.data
+            if isinstance(data, dict) and isinstance(data.get('results'),
+                                                     list):
+                items = data['results']
+            elif isinstance(data, list):
+                items = data
+            else:
+                items = [data]
+            self.expand(items, self.get_serializer_class(), self.expand_tree)
+        return response
+
+    def expand(self, items, serializer_class, tree):
+        """
+        Replaces in place the values of the fields in `tree` of the
+        representations `items` of `serializer_class` by the representations
+        of the objects they refer to.
+        """
+        for name, subtree in tree.items():
+            view, to_field = self.get_expand_view(serializer_class, name)
+            values = set()
+            for item in items:
+                value = item.get(name)
+                if isinstance(value, list):
+                    values.update(value)
+                elif value is not None and not isinstance(value, dict):
+                    values.add(value)
+            if not values:
+                continue
+
+            objects = [
+                obj for obj in view.get_queryset().filter(
+                    **{to_field + '__in': values})
+                if self.can_expand(view, obj)
+            ]
+            target_class = view.get_serializer_class()
+            representations = target_class(
+                objects, many=True, context=view.get_serializer_context(),
+            ).data
+            if subtree:
+                self.expand(representations, target_class, subtree)
+            expanded = dict(
+                (getattr(obj, to_field), representation)
+                for obj, representation in zip(objects, representations))
+
+            for item in items:
+                value = item.get(name)
+                if isinstance(value, list):
+                    item[name] = [expanded.get(v, v) for v in value]
+                elif not isinstance(value, dict) and value in expanded:
+                    item[name] = expanded[value]
+
+    def can_expand(self, view, obj):
+        """
+        Returns True if the permissions of `view` allow the current user to
+        retrieve `obj`.
+        """
+        return all(
+            permission.has_permission(self.request, view) and
+            permission.has_object_permission(self.request, view, obj)
+            for permission in view.get_permissions()
+        )
+
+
+class ConditionalGetMixin(object):
+    """
+    A mixin that adds an ETag to the responses of the `list` and `retrieve`
+    actions, and answers requests whose `If-None-Match` matches it with 304
+    Not Modified before serializing anything.
+
+    The model must have a field, `updated_field`, that is set on every write
+    of an object. The ETag of a list is computed from the number of objects
+    and the latest update in the filtered queryset with a single aggregate
+    query. The ETag of an object is computed from its last update. Both
+    include the full path of the request and the memberships of the User,
+    which the representations and the scope of the lists depend on.
+    Responses with expanded fields have no ETag, as they depend on other
+    objects too.
+    """
+    updated_field = 'updated'
+
+    def get_etag(self, *parts):
+        """
+        Returns the ETag of the response to the current request, for a
+        state of the data described by `parts`.
+        """
+        key = [self.request.get_full_path(),
+               get_context(self.request.user).fingerprint()]
+        key.extend(str(part) for part in parts)
+        return '"{}"'.format(
+            hashlib.sha1('|'.join(key).encode('utf-8')).hexdigest())
+
+    def is_conditional(self):
+        """
+        Returns True if the response to the current request can have an ETag.
+        """
+        return not getattr(self, 'expand_tree', None)
+
+    def list(self, request, *args, **kwargs):
+        if not self.is_conditional():
+            return super(ConditionalGetMixin, self).list(
+                request, *args, **kwargs)
+        etag = self.get_etag(*self.get_list_version())
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        response = self.get_list_response(request, *args, **kwargs)
+        response['ETag'] = etag
+        return response
+
+    def get_list_version(self):
+        """
+        Returns a tuple of values which change whenever the objects of the
+        list change.
+        """
+        state = self.filter_queryset(self.get_queryset()).aggregate(
+            count=Count('pk'), updated=Max(self.updated_field))
+        return state['count'], state['updated']
+
+    def get_list_response(self, request, *args, **kwargs):
+        """
+        Returns the response of the `list` action, once the request is known
+        not to be conditional on it.
+        """
+        return super(ConditionalGetMixin, self).list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.is_conditional():
+            return super(ConditionalGetMixin, self).retrieve(
+                request, *args, **kwargs)
+        instance = self.get_object()
+        etag = self.get_etag(getattr(instance, self.updated_field))
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        serializer = self.get_serializer(instance)
+        response = Response(serializer.data)
+        response['ETag'] = etag
+        return response
+
+
+class SharedListCacheMixin(ConditionalGetMixin):
+    """
+    A ConditionalGetMixin whose list responses are cached and shared by all
+    users, except for the `overlay_fields` of the serializer, which depend on
+    the User and are added to every cached object by `overlay()`. They are
+    appended to the objects, so they should be the last serializer fields.
+
+    The responses are cached for `SHARED_LIST_CACHE_TIMEOUT` seconds under
+    the absolute URL of the request and the generations of the scopes
+    returned by `get_shared_scopes()`, which returns None for the requests
+    whose response can not be shared.
+    """
+    overlay_fields = ()
+
+    def get_shared_scopes(self):
+        """
+        Returns the generation scopes of `api.generations` which the shared
+        list depends on, or None if the list can not be shared.
+        """
+        return None
+
+    def overlay(self, objects):
+        """
+        Adds the `overlay_fields` for the current User to the representations
+        `objects` read from the shared cache. There are none by default.
+        """
+        pass
+
+    def get_list_version(self):
+        scopes = self.get_shared_scopes()
+        if scopes is None:
+            return super(SharedListCacheMixin, self).get_list_version()
+        # The scopes mix ids of Clubs with e.g. CLUB_DIRECTORY
+        return tuple(sorted(generations.get_generations(scopes).items(),
+                            key=lambda item: str(item[0])))
+
+    def get_list_response(self, request, *args, **kwargs):
+        scopes = self.get_shared_scopes()
+        if scopes is None:
+            return super(SharedListCacheMixin, self).get_list_response(
+                request, *args, **kwargs)
+
+        key = generations.make_key('api:shared-list', scopes,
+                                   request.build_absolute_uri())
+        data = cache.get(key)
+        if data is None:
+            queryset = self.filter_queryset(self.get_queryset())
+            page = self.paginate_queryset(queryset)
+            serializer = self.get_serializer(
+                queryset if page is None else page, many=True)
+            for name in self.overlay_fields:
+                serializer.child.fields.pop(name, None)
+            data = serializer.data if page is None else \
+                self.get_paginated_response(serializer.data).data
+            cache.set(key, data, settings.SHARED_LIST_CACHE_TIMEOUT)
+
+        fields = self.get_sparse_fields()
+        if any(fields is None or name in fields
+               for name in self.overlay_fields):
+            self.overlay(data['results'] if isinstance(data, dict) else data)
+        return Response(data)
+
+
+class ValuesListMixin(SparseFieldsMixin):
+    """
+    A mixin that builds the response of the `list` action from the rows of
+    `QuerySet.values()` with the ValuesReader of the serializer class, instead
+    of serializing model instances. The serializer must be supported by
+    `api.readers`. The rows only contain the fields selected as in
+    SparseFieldsMixin. The reader selects the columns of the rows itself, so
+    eager loading profiles do not apply to the `list` action.
+    """
+
+    def list(self, request, *args, **kwargs):
+        reader = readers.get_reader(self.get_serializer_class())
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            reader = reader.subset(fields)
+        # Cursor pagination reads the timeline field and id from the rows
+        extra = (self.timeline_field, 'id') \
+            if getattr(self, 'timeline_field', None) else ()
+        queryset = reader.read(self.filter_queryset(self.get_queryset()),
+                               extra)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(reader.represent(page))
+        return Response(reader.represent(queryset))
@@ -1 +1,117 @@
-# Create your tests here.
+"""
+Tests for the auth app.
+"""
+
+from allauth.account.models import EmailAddress
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api import constants, models, tokens
+
+
+class AccessTokenTests(TransactionTestCase):
+    """
+    Tests of the signed access tokens and the refresh tokens of
+    `api.tokens`. The token versions are only bumped once the transaction
+    is committed, so the changes made by these tests are committed.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'member', email='member@example.com', password='password')
+        EmailAddress.objects.create(user=self.user, email=self.user.email,
+                                    verified=True, primary=True)
+        self.club = models.Club.objects.create(name='A', description='A')
+        self.club.add_member(self.user)
+        self.client = APIClient()
+
+    def login(self):
+        response = self.client.post(reverse('access_token'), {
+            'username': 'member',
+            'password': 'password',
+        })
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def refresh(self, refresh_token):
+        return self.client.post(reverse('access_token_refresh'),
+                                {'refresh_token': refresh_token})
+
+    def get_users(self, access_token):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + access_token)
+        return client.get(reverse('user-list'))
+
+    def test_issue(self):
+        data = self.login()
+        self.assertEqual(data['expires_in'], settings.ACCESS_TOKEN_LIFETIME)
+        payload = tokens.read_access_token(data['access_token'])
+        self.assertEqual(payload['uid'], self.user.id)
+        self.assertEqual(payload['clubs'],
+                         {self.club.id: constants.PRIVILEGE_MEM})
+        self.assertEqual(self.get_users(data['access_token']).status_code,
+                         200)
+
+    def test_refresh(self):
+        data = self.login()
+        response = self.refresh(data['refresh_token'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data['refresh_token'],
+                            data['refresh_token'])
+        self.assertEqual(
+            self.get_users(response.data['access_token']).status_code, 200)
+
+    def test_refresh_token_reuse(self):
+        data = self.login()
+        self.assertEqual(self.refresh(data['refresh_token']).status_code,
+                         200)
+        response = self.refresh(data['refresh_token'])
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(str(response.data['detail']),
+                         'Invalid refresh token.')
+
+    def test_expired_refresh_token(self):
+        data = self.login()
+        models.RefreshToken.objects.update(expires=timezone.now())
+        response = self.refresh(data['refresh_token'])
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(str(response.data['detail']),
+                         'Expired refresh token.')
+        # The stale token has been deleted anyway
+        self.assertFalse(models.RefreshToken.objects.exists())
+
+    def test_refresh_token_after_password_change(self):
+        data = self.login()
+        user = get_user_model().objects.get(pk=self.user.pk)
+        user.set_password('other password')
+        user.save()
+        response = self.refresh(data['refresh_token'])
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(models.RefreshToken.objects.exists())
+
+    def test_revoked_after_membership_change(self):
+        data = self.login()
+        models.ClubMembership.objects.filter(user=self.user).delete()
+        response = self.get_users(data['access_token'])
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(str(response.data['detail']), 'Revoked token.')
+
+        # A refreshed access token carries the new memberships
+        response = self.refresh(data['refresh_token'])
+        self.assertEqual(response.status_code, 200)
+        payload = tokens.read_access_token(response.data['access_token'])
+        self.assertEqual(payload['clubs'], {})
+
+    def test_revoked_after_user_deleted(self):
+        # Without memberships, whose deletion would revoke the tokens too
+        models.ClubMembership.objects.filter(user=self.user).delete()
+        data = self.login()
+        get_user_model().objects.get(pk=self.user.pk).delete()
+        with self.assertRaisesMessage(tokens.InvalidToken, 'Revoked token.'):
+            tokens.read_access_token(data['access_token'])
@@ -20,6 +20,10 @@ urlpatterns = [
     url(r'^registration/logout/$',
         LogoutView.as_view(),
         name='account_logout'),
+    url(r'^token/$', views.AccessTokenLoginView.as_view(),
+        name='access_token'),
+    url(r'^token/refresh/$', views.AccessTokenRefreshView.as_view(),
+        name='access_token_refresh'),
     url(r'^', include('rest_auth.urls')),
     url(r'^registration/', include('rest_auth.registration.urls')),
     # Social media authorization endpoints
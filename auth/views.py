@@ -7,9 +7,12 @@ from allauth.socialaccount.providers.twitter.views import TwitterOAuthAdapter
 from rest_auth.registration.views import SocialLoginView
 from rest_auth.social_serializers import TwitterLoginSerializer
 from rest_auth.views import LoginView
-from rest_framework import status
+from rest_framework import exceptions, permissions, status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from api import tokens
 
 
 @api_view()
@@ -37,3 +40,35 @@ class TwitterLogin(LoginView):
     """
     serializer_class = TwitterLoginSerializer
     adapter_class = TwitterOAuthAdapter
+
+
+class AccessTokenLoginView(LoginView):
+    """
+    Login which also returns a signed access token and a refresh token, see
+    `api.tokens`.
+    """
+
+    def get_response(self):
+        response = super(AccessTokenLoginView, self).get_response()
+        response.data.update(tokens.issue_tokens(self.user))
+        return response
+
+
+class AccessTokenRefreshView(APIView):
+    """
+    Exchanges a refresh token for a new signed access token and a new refresh
+    token.
+    """
+    authentication_classes = ()
+    permission_classes = (permissions.AllowAny,)
+
+    def post(self, request, *args, **kwargs):
+        key = request.data.get('refresh_token')
+        if not isinstance(key, str) or not key:
+            raise exceptions.ValidationError(
+                {'refresh_token': 'This field is required.'})
+        try:
+            data = tokens.refresh_tokens(key)
+        except tokens.InvalidToken as error:
+            raise exceptions.AuthenticationFailed(str(error))
+        return Response(data, status=status.HTTP_200_OK)
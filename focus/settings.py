@@ -80,9 +80,22 @@ ACCOUNT_EMAIL_CONFIRMATION_AUTHENTICATED_REDIRECT_URL = '/auth/registration/emai
 EMAIL_CONFIRMATION_URL = config.BASE_URL + '/auth/registration/verify-email/'
 PASSWORD_RESET_URL = config.BASE_URL + '/auth/registration/password/reset/confirm/'
 
-# Uncomment the following line to print the mails on console instead of
-# actually using SMTP server to send them.
-# EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+# The mails are queued in the outbox and sent by the `send_outbox` management
+# command with OUTBOX_EMAIL_BACKEND. Use
+# 'django.core.mail.backends.console.EmailBackend' as OUTBOX_EMAIL_BACKEND to
+# print the mails on console instead of actually using SMTP server to send
+# them.
+EMAIL_BACKEND = 'api.mail.OutboxEmailBackend'
+OUTBOX_EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Number of emails that `send_outbox` claims at once.
+OUTBOX_BATCH_SIZE = 50
+# Number of seconds after which `send_outbox` tries a claimed email again if
+# it was neither sent nor failed, e.g. because the worker was killed.
+OUTBOX_CLAIM_TIMEOUT = 600
+# Number of seconds before the first retry of an email, doubled on every
+# attempt, and number of attempts before giving up.
+OUTBOX_RETRY_DELAY = 60
+OUTBOX_MAX_ATTEMPTS = 5
 
 # SMTP server details
 EMAIL_HOST = credentials.EMAIL_HOST
@@ -194,15 +207,67 @@ REST_FRAMEWORK = {
         'django_filters.rest_framework.DjangoFilterBackend',
     ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.SignedAccessTokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.BasicAuthentication',
+        'api.authentication.CachedBasicAuthentication',
     ),
     'DEFAULT_PAGINATION_CLASS':
         'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 50,
+    # The JSON renderer and parser use orjson if it is installed
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.FastJSONRenderer',
+        'api.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'api.parsers.FastJSONParser',
+        'api.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+}
+
+# Dotted path of the full-text search backend for Post and Conversation
+# content. If None, the backend for the database in use is chosen from
+# api.search.
+SEARCH_BACKEND = None
+
+# Cache settings
+# The per-Club generation counters of api.generations live in the default
+# cache, which must be shared by all server processes in production, e.g.
+# Memcached or Redis.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'KEY_PREFIX': 'focus',
+    }
 }
 
+# Number of seconds that the list responses shared by all users are kept in
+# the cache by api.viewsets.SharedListCacheMixin.
+SHARED_LIST_CACHE_TIMEOUT = 300
+# Number of seconds that api.authentication.CachedTokenAuthentication keeps
+# an authenticated token in the cache.
+TOKEN_CACHE_TIMEOUT = 300
+# Number of seconds and maximum number of entries that
+# api.authentication.CachedBasicAuthentication keeps verified credentials in
+# the memory of each process.
+BASIC_AUTH_CACHE_TIMEOUT = 60
+BASIC_AUTH_CACHE_SIZE = 1000
+# Number of seconds that the signed access tokens and the refresh tokens
+# issued by auth.views.AccessTokenLoginView are valid for.
+ACCESS_TOKEN_LIFETIME = 300
+REFRESH_TOKEN_LIFETIME = 14 * 24 * 60 * 60
+
+# Home timeline settings
+# Channels with more subscribers than this are read on demand instead of
+# writing every new Post to the timeline of each subscriber.
+TIMELINE_FANOUT_MAX_SUBSCRIBERS = 1000
+# Number of timeline entries to insert per query.
+TIMELINE_BATCH_SIZE = 1000
+
 # rest-auth settings
 REST_AUTH_SERIALIZERS = {
     'PASSWORD_RESET_SERIALIZER':